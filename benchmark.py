@@ -0,0 +1,278 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import deque
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+import environment
+from environment.android_env import encode_texts
+from environment.simulated_env import SCREENS, SimulatedAndroidEnv
+from eval import MetricsCallback
+from main import train
+
+
+class TimedEnv(gym.Wrapper):
+    """
+    Measures the time spent in the environment.
+    """
+
+    def __init__(self, env):
+        super().__init__(env)
+        self.env_time = 0.0
+        self.env_steps = 0
+
+    def reset(self, *, seed=None, options=None):
+        start = time.perf_counter()
+        result = self.env.reset(seed=seed, options=options)
+        self.env_time += time.perf_counter() - start
+        return result
+
+    def step(self, action):
+        start = time.perf_counter()
+        result = self.env.step(action)
+        self.env_time += time.perf_counter() - start
+        self.env_steps += 1
+        return result
+
+
+class TimedMetricsCallback(MetricsCallback):
+    """
+    `MetricsCallback` measuring the time spent in the callback, in writing the metrics and plots (during and
+    after the training) and the duration of `learn`.
+    """
+
+    def __init__(self, env, *args, **kwargs):
+        """
+        Args:
+            env (TimedEnv): The environment, whose time during `learn` is measured.
+            *args, **kwargs: The arguments of `MetricsCallback`.
+        """
+        super(TimedMetricsCallback, self).__init__(*args, **kwargs)
+        self.env = env
+        self.callback_time = 0.0        # Including the plotting during the training
+        self.plotting_time = 0.0
+        self.training_plotting_time = 0.0
+        self.training_time = 0.0
+        self.training_env_time = 0.0
+
+    def _on_training_start(self) -> None:
+        self.training_start = time.perf_counter()
+        self.env_time_at_start = self.env.env_time
+
+    def _on_training_end(self) -> None:
+        self.training_time = time.perf_counter() - self.training_start
+        self.training_env_time = self.env.env_time - self.env_time_at_start
+
+    def _on_step(self) -> bool:
+        start = time.perf_counter()
+        plotting_time = self.plotting_time
+        result = super(TimedMetricsCallback, self)._on_step()
+        self.callback_time += time.perf_counter() - start
+        self.training_plotting_time += self.plotting_time - plotting_time
+        return result
+
+    def save_metrics(self):
+        start = time.perf_counter()
+        super(TimedMetricsCallback, self).save_metrics()
+        self.plotting_time += time.perf_counter() - start
+
+    def plot_metrics(self):
+        start = time.perf_counter()
+        super(TimedMetricsCallback, self).plot_metrics()
+        self.plotting_time += time.perf_counter() - start
+
+
+class SuccessThresholdCallback(BaseCallback):
+    """
+    Records when the success rate over the last `window` episodes reaches the threshold for the first time.
+    """
+
+    def __init__(self, success_reward, success_rate=90.0, window=20, stop=True, verbose=0):
+        super(SuccessThresholdCallback, self).__init__(verbose)
+        self.success_reward = success_reward
+        self.success_rate = success_rate
+        self.stop = stop
+        self.successes = deque(maxlen=window)
+        self.start_time = time.perf_counter()
+        self.reached_time = None
+        self.reached_timesteps = None
+
+    def _on_step(self) -> bool:
+        if self.locals.get('dones')[0]:
+            self.successes.append(self.locals.get('rewards')[0] == self.success_reward)
+            if (self.reached_time is None and len(self.successes) == self.successes.maxlen
+                    and 100.0 * sum(self.successes) / len(self.successes) >= self.success_rate):
+                self.reached_time = time.perf_counter() - self.start_time
+                self.reached_timesteps = self.num_timesteps
+                return not self.stop
+        return True
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024   # bytes on macOS, kilobytes on Linux
+
+
+def run_benchmark(task="airplane", exploration_mode="guided_restricted", episode_timesteps=100, total_timesteps=5000,
+                  success_rate=90.0, window=20, stop_at_success=True, speculation=False, log_dir=None, quiet=True):
+    """
+    Run the training pipeline (`main.train` with Monitor, MetricsCallback and DQN) against the deterministic
+    simulated backend and measure its throughput. Checkpoints are disabled, so their writing isn't measured.
+
+    Args:
+        task (str): The task to train. Defaults to "airplane".
+        exploration_mode (str): Exploration mode of the agent. Defaults to "guided_restricted".
+        episode_timesteps (int): The maximum number of steps per episode. Defaults to 100.
+        total_timesteps (int): The maximum number of timesteps. Defaults to 5000.
+        success_rate (float): Success rate (in percent) over the last `window` episodes to reach. Defaults to 90.0.
+        window (int): Number of episodes of the success rate. Defaults to 20.
+        stop_at_success (bool): Whether to stop the training when the success rate is reached. Defaults to True.
+        speculation (bool): Whether the environment uses speculative observations. Defaults to False.
+        log_dir (str): Log directory of the training. Defaults to None, which creates a timestamped directory.
+        quiet (bool): Whether to discard the output of the training. Defaults to True.
+
+    Returns:
+        result (dict): The configuration and the measurements of the benchmark.
+    """
+    env = TimedEnv(gym.make("AndroidSim-v0", task=task, exploration_mode=exploration_mode, episode_timesteps=episode_timesteps,
+                            speculation=speculation))
+    log_dir = log_dir or os.path.join("logs", "benchmark_{0}_{1}".format(task, time.strftime("%Y%m%d_%H%M%S")))
+    metrics_callback = TimedMetricsCallback(env, log_dir=log_dir, eval_freq=episode_timesteps, success_threshold=episode_timesteps/2.0)
+    threshold_callback = SuccessThresholdCallback(episode_timesteps/2.0, success_rate=success_rate, window=window, stop=stop_at_success)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+        start = time.perf_counter()
+        # Without checkpoints, which would add the writing of the model to the measured throughput
+        model, _ = train(env, task, total_timesteps=total_timesteps, episode_timesteps=episode_timesteps, checkpoint_freq=None,
+                         log_dir=log_dir, metrics_callback=metrics_callback, callbacks=[threshold_callback])
+        wall_time = time.perf_counter() - start
+    speculation_stats = env.unwrapped.speculation_stats()
+    env.close()
+
+    # Disjoint shares: the learner is the time of `learn` without the environment and callbacks, the remaining
+    # time ("other") is the creation of the model, the final save and the first reset
+    learner_time = metrics_callback.training_time - metrics_callback.training_env_time - metrics_callback.callback_time
+    callback_time = metrics_callback.callback_time - metrics_callback.training_plotting_time
+    other_time = wall_time - env.env_time - callback_time - metrics_callback.plotting_time - learner_time
+    return {
+        "commit": _git_commit(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "task": task,
+        "exploration_mode": exploration_mode,
+        "episode_timesteps": episode_timesteps,
+        "total_timesteps": total_timesteps,
+        "timesteps": model.num_timesteps,
+        "episodes": metrics_callback.total_episodes,
+        "wall_time_s": wall_time,
+        "env_steps_per_s": env.env_steps / env.env_time if env.env_time else 0.0,
+        "pipeline_steps_per_s": model.num_timesteps / wall_time,
+        "learner_updates_per_s": model._n_updates / learner_time if learner_time > 0 else 0.0,
+        "time_to_success_s": threshold_callback.reached_time,
+        "timesteps_to_success": threshold_callback.reached_timesteps,
+        "peak_rss_mb": _peak_rss_mb(),
+        "env_share": env.env_time / wall_time,
+        "callback_share": callback_time / wall_time,
+        "plotting_share": metrics_callback.plotting_time / wall_time,
+        "learner_share": learner_time / wall_time,
+        "other_share": other_time / wall_time,
+        "speculation": speculation,
+        "speculation_hit_rate": speculation_stats["hit_rate"],
+        "speculation_hidden_latency_s": speculation_stats["hidden_latency_s"],
+        "speculation_misprediction_cost_s": speculation_stats["misprediction_cost_s"],
+    }
+
+
+def benchmark_text_encoding(n_steps=10000):
+    """
+    Compare building the "ui_text" observation by encoding the texts in every step with the cached encoding table
+    of `AndroidEnv`, for the screens of the simulated backend.
+
+    Args:
+        n_steps (int): The number of observations per method. Defaults to 10000.
+
+    Returns:
+        result (dict): The time per observation (in microseconds) of each method.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        env = SimulatedAndroidEnv(observation_mode="ui_text")
+    length = env.max_text_length
+    screens = []
+    for package, elements in SCREENS.values():
+        ui_options = [{"id": env.ui_vocabulary.add(text, package), "text": text} for text, _ in elements][:env.max_current_ui_options]
+        ids = np.zeros(env.max_current_ui_options, dtype=np.int32)
+        ids[:len(ui_options)] = [ui_option["id"] for ui_option in ui_options]
+        screens.append((ids, ui_options))
+
+    def encode_loop(ids, ui_options):
+        text_array = np.zeros((env.max_current_ui_options, length), dtype=np.uint8)
+        for i, ui_option in enumerate(ui_options):
+            for j, byte in enumerate(ui_option["text"].encode("utf-8")[:length]):
+                text_array[i, j] = byte
+        return text_array
+
+    def encode_vectorized(ids, ui_options):
+        text_array = np.zeros((env.max_current_ui_options, length), dtype=np.uint8)
+        text_array[:len(ui_options)] = encode_texts([ui_option["text"] for ui_option in ui_options], length)
+        return text_array
+
+    methods = {"per_step_loop": encode_loop, "per_step_vectorized": encode_vectorized, "cached_gather": env._get_text_obs}
+    result = {"commit": _git_commit(), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "benchmark": "text_encoding", "n_steps": n_steps}
+    for name, method in methods.items():
+        for ids, ui_options in screens:
+            assert np.array_equal(method(ids, ui_options), encode_loop(ids, ui_options))
+        start = time.perf_counter()
+        for step in range(n_steps):
+            method(*screens[step % len(screens)])
+        result[f"{name}_us"] = (time.perf_counter() - start) / n_steps * 1e6
+    env.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end training benchmark on the simulated Android backend.")
+    parser.add_argument("--task", default="airplane")
+    parser.add_argument("--exploration-mode", default="guided_restricted")
+    parser.add_argument("--episode-timesteps", type=int, default=100)
+    parser.add_argument("--total-timesteps", type=int, default=5000)
+    parser.add_argument("--success-rate", type=float, default=90.0)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--no-stop", action="store_true", help="Train for all timesteps after reaching the success rate.")
+    parser.add_argument("--speculation", action="store_true", help="Use speculative observations in the environment.")
+    parser.add_argument("--output", default=os.path.join("logs", "benchmark_results.jsonl"),
+                        help="File the result is appended to, for comparisons across commits.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the training.")
+    parser.add_argument("--text-encoding", action="store_true",
+                        help="Run the micro-benchmark of the text observations instead of the training.")
+    args = parser.parse_args()
+
+    if args.text_encoding:
+        result = benchmark_text_encoding()
+    else:
+        result = run_benchmark(task=args.task, exploration_mode=args.exploration_mode, episode_timesteps=args.episode_timesteps,
+                               total_timesteps=args.total_timesteps, success_rate=args.success_rate, window=args.window,
+                               stop_at_success=not args.no_stop, speculation=args.speculation,
+                               quiet=not args.verbose)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(result) + "\n")
+    for key, value in result.items():
+        print(f"{key:24} {value:.4g}" if isinstance(value, float) else f"{key:24} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import copy
+import glob
+import json
+import os
+import pickle
+import shutil
+import threading
+import traceback
+import numpy as np
+from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+# Arrays of a replay buffer stored in the checkpoints, observations are dictionaries for Dict observation spaces
+_REPLAY_BUFFER_FIELDS = ("observations", "next_observations", "actions", "rewards", "dones", "timeouts")
+
+
+class BackgroundCheckpointCallback(BaseCallback):
+    """
+    Callback for periodic checkpoints of the model, its replay buffer, the training metrics and the UI vocabulary
+    of the environment. The checkpoints are written in the background, so the learner isn't blocked: in a forked
+    process, which gets a copy-on-write snapshot of the training state for free, or in a thread writing a copy
+    of the state if forking isn't possible. A final checkpoint is written at the end of the training, so a training
+    can always be continued from its last timestep. Only the newest `max_checkpoints` checkpoints are kept.
+    """
+
+    def __init__(self, save_path, save_freq=1000, metrics_callback=None, save_replay_buffer=True, max_checkpoints=3, verbose=1):
+        """
+        Initialize the callback.
+
+        Args:
+            save_path (str): Directory to store the checkpoints.
+            save_freq (int): Frequency (in timesteps) of the checkpoints. Defaults to 1000.
+            metrics_callback (MetricsCallback): Callback whose metrics are stored in the checkpoints. Defaults to None.
+            save_replay_buffer (bool): Whether the filled part of the replay buffer is stored in the checkpoints.
+                Defaults to True.
+            max_checkpoints (int): The number of checkpoints to keep. Defaults to 3.
+            verbose (int): Verbosity level (0 = silent, 1 = info messages). Defaults to 1.
+        """
+        super(BackgroundCheckpointCallback, self).__init__(verbose)
+        self.save_path = save_path
+        self.save_freq = save_freq
+        self.metrics_callback = metrics_callback
+        self.save_replay_buffer = save_replay_buffer
+        self.max_checkpoints = max_checkpoints
+        self.pending = None   # Process ID or thread of the checkpoint being written
+        self.last_checkpoint = 0      # Timestep of the last checkpoint
+        self.deferred = False         # Whether a checkpoint waits for the previous one
+        os.makedirs(save_path, exist_ok=True)
+
+    def _on_training_start(self) -> None:
+        self.last_checkpoint = self.num_timesteps   # A resumed training starts at the timestep of its checkpoint
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self) -> None:
+        """
+        Start a checkpoint once `save_freq` timesteps have passed since the last one. SB3 stores the transitions of a
+        step only after the `on_step` callbacks, so checkpoints are taken at the end of a rollout, when the replay
+        buffer contains all transitions up to the current timestep. A checkpoint is deferred while the previous
+        one is still being written.
+        """
+        if self.num_timesteps - self.last_checkpoint >= self.save_freq:
+            if self._writing():
+                if self.verbose > 0 and not self.deferred:
+                    print(f"Deferring checkpoint at {self.num_timesteps} timesteps - previous checkpoint still in progress")
+                self.deferred = True
+            else:
+                self.deferred = False
+                self.checkpoint()
+
+    def _on_training_end(self) -> None:
+        """
+        Write a checkpoint of the final state, unless the last checkpoint already has it, and wait until it is written.
+        """
+        self.wait()
+        if self.last_checkpoint != self.num_timesteps:
+            self.checkpoint()
+            self.wait()
+
+    def checkpoint(self):
+        """
+        Start writing a checkpoint of the current training state in the background.
+        """
+        path = os.path.join(self.save_path, f"step_{self.num_timesteps:09d}")
+        self.last_checkpoint = self.num_timesteps
+
+        # CUDA can't be used after forking, so the thread fallback is used for models on the GPU
+        if hasattr(os, "fork") and self.model.device.type == "cpu":
+            pid = os.fork()
+            if pid == 0:
+                exit_code = 0
+                try:
+                    self._write(path, self.model, self._get_metrics(), self._get_vocabulary(), self._get_replay_buffer(copy=False))
+                except BaseException:
+                    traceback.print_exc()
+                    exit_code = 1
+                finally:
+                    os._exit(exit_code)
+            self.pending = pid
+        else:
+            # Copy the training state in the learner thread, the thread only serializes the copy. Only the filled part
+            # of the replay buffer is copied, the model is saved without it.
+            model = copy.copy(self.model)
+            model.policy = copy.deepcopy(self.model.policy).to("cpu")
+            model.ep_info_buffer = copy.deepcopy(self.model.ep_info_buffer)
+            model.ep_success_buffer = copy.deepcopy(self.model.ep_success_buffer)
+            self.pending = threading.Thread(target=self._write, daemon=True, args=(
+                path, model, copy.deepcopy(self._get_metrics()), self._get_vocabulary(), self._get_replay_buffer(copy=True)))
+            self.pending.start()
+
+        if self.verbose > 0:
+            print(f"Writing checkpoint to {path}")
+
+    def wait(self):
+        """
+        Wait until the pending checkpoint is written.
+        """
+        if isinstance(self.pending, threading.Thread):
+            self.pending.join()
+        elif self.pending is not None:
+            os.waitpid(self.pending, 0)
+        self.pending = None
+
+    def _writing(self):
+        if isinstance(self.pending, threading.Thread):
+            return self.pending.is_alive()
+        if self.pending is not None and os.waitpid(self.pending, os.WNOHANG)[0] == 0:
+            return True
+        self.pending = None
+        return False
+
+    def _get_metrics(self):
+        return self.metrics_callback.get_state() if self.metrics_callback is not None else None
+
+    def _get_replay_buffer(self, copy):
+        if not self.save_replay_buffer or self.model.replay_buffer is None:
+            return None
+        return replay_buffer_arrays(self.model.replay_buffer, copy=copy)
+
+    def _get_vocabulary(self):
+        try:
+            return self.training_env.get_attr("ui_vocabulary")[0].entries()
+        except AttributeError:
+            return None
+
+    def _write(self, path, model, metrics, vocabulary, replay_buffer):
+        """
+        Write a checkpoint into a temporary directory and rename it afterwards, so that incomplete checkpoints
+        are never resumed. Removes the oldest checkpoints afterwards.
+        """
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        model.save(os.path.join(tmp_path, "model.zip"))
+        if replay_buffer is not None:
+            with open(os.path.join(tmp_path, "replay_buffer.npz"), "wb") as f:
+                np.savez_compressed(f, **replay_buffer)
+        if metrics is not None:
+            with open(os.path.join(tmp_path, "metrics.pkl"), "wb") as f:
+                pickle.dump(metrics, f)
+        if vocabulary is not None:
+            with open(os.path.join(tmp_path, "vocabulary.json"), "w", encoding="utf-8") as f:
+                json.dump(vocabulary, f)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+
+        for old_path in list_checkpoints(self.save_path)[:-self.max_checkpoints]:
+            shutil.rmtree(old_path, ignore_errors=True)
+
+
+def replay_buffer_arrays(buffer, copy=False):
+    """
+    Collect the filled part of a replay buffer, instead of its whole preallocated arrays.
+
+    Args:
+        buffer (ReplayBuffer | DictReplayBuffer): The replay buffer.
+        copy (bool): Whether to copy the arrays, otherwise they are views of the buffer. Defaults to False.
+
+    Returns:
+        arrays (dict): The arrays by name ("<field>" or "<field>.<key>" for dictionary observations),
+            including the position "pos" and "full" of the buffer.
+    """
+    size = buffer.buffer_size if buffer.full else buffer.pos
+    arrays = {"pos": np.array(buffer.pos), "full": np.array(buffer.full)}
+    for field in _REPLAY_BUFFER_FIELDS:
+        value = getattr(buffer, field, None)
+        columns = value.items() if isinstance(value, dict) else [(None, value)]
+        for key, array in columns:
+            if array is not None:
+                name = field if key is None else "{0}.{1}".format(field, key)
+                arrays[name] = array[:size].copy() if copy else array[:size]
+    return arrays
+
+
+def load_replay_buffer(buffer, path):
+    """
+    Fill a replay buffer with the arrays written by `BackgroundCheckpointCallback`.
+
+    Args:
+        buffer (ReplayBuffer | DictReplayBuffer): The replay buffer of the same observation and action space.
+        path (str): Path to the "replay_buffer.npz" of a checkpoint.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        pos, full = int(data["pos"]), bool(data["full"])
+        if full and data["rewards"].shape[0] != buffer.buffer_size:
+            raise ValueError("A full replay buffer of size {0} can't be restored into a buffer of size {1}"
+                             .format(data["rewards"].shape[0], buffer.buffer_size))
+        for name in data.files:
+            if name in ("pos", "full"):
+                continue
+            field, _, key = name.partition(".")
+            target = getattr(buffer, field)[key] if key else getattr(buffer, field)
+            values = data[name]
+            if values.shape[0] > target.shape[0] or values.shape[1:] != target.shape[1:]:
+                raise ValueError("The replay buffer array {0} of shape {1} doesn't fit into {2}".format(name, values.shape, target.shape))
+            target[:values.shape[0]] = values
+    buffer.pos, buffer.full = pos, full
+
+
+def list_checkpoints(save_path):
+    """
+    List the complete checkpoints in a directory.
+
+    Args:
+        save_path (str): Directory of the checkpoints.
+
+    Returns:
+        checkpoints (list): Paths of the checkpoints, from the oldest to the newest.
+    """
+    return sorted(path for path in glob.glob(os.path.join(save_path, "step_*")) if not path.endswith(".tmp"))
+
+
+def restore_checkpoint(path, env, metrics_callback=None, tensorboard_log=None):
+    """
+    Restore the training state from a checkpoint written by `BackgroundCheckpointCallback`.
+
+    Args:
+        path (str): Directory of the checkpoint.
+        env: The environment in which the training continues.
+        metrics_callback (MetricsCallback): Callback whose metrics are restored. Defaults to None.
+        tensorboard_log (str): Directory for the tensorboard logs. Defaults to None.
+
+    Returns:
+        model (DQN): The restored model, including its replay buffer and timestep count.
+    """
+    model = DQN.load(os.path.join(path, "model.zip"), env=env, tensorboard_log=tensorboard_log)
+
+    replay_buffer_path = os.path.join(path, "replay_buffer.npz")
+    if os.path.exists(replay_buffer_path):
+        load_replay_buffer(model.replay_buffer, replay_buffer_path)
+
+    metrics_path = os.path.join(path, "metrics.pkl")
+    if metrics_callback is not None and os.path.exists(metrics_path):
+        with open(metrics_path, "rb") as f:
+            metrics_callback.set_state(pickle.load(f))
+
+    vocabulary_path = os.path.join(path, "vocabulary.json")
+    if os.path.exists(vocabulary_path):
+        with open(vocabulary_path, encoding="utf-8") as f:
+            env.get_wrapper_attr("ui_vocabulary").restore(json.load(f))
+
+    print(f"Restored checkpoint {path} at {model.num_timesteps} timesteps")
+    return model
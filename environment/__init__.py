@@ -2,3 +2,12 @@ from gymnasium.envs.registration import register
 
 register(id="Android-v0",
          entry_point="environment.android_env:AndroidEnv")
+
+register(id="RemoteAndroid-v0",
+         entry_point="environment.remote_env:RemoteAndroidEnv")
+
+register(id="AndroidSim-v0",
+         entry_point="environment.simulated_env:SimulatedAndroidEnv")
+
+register(id="AndroidStandby-v0",
+         entry_point="environment.standby_env:HotStandbyAndroidEnv")
@@ -1,11 +1,13 @@
+from collections import Counter, OrderedDict
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from environment.airplane_task import AirplaneTask
-from environment.youtube_task import YoutubeTask
+from environment.hierarchy_diff import IncrementalExtractor
+from environment.task_spec import CompiledTask, load_task_spec
+from environment.ui_vocabulary import UIVocabulary
 import xml.etree.ElementTree as ET
 import os
-import re
+import threading
 import time
 
 
@@ -14,13 +16,17 @@ class AndroidEnv(gym.Env):
     such as enabling airplane mode. The agent performs actions based on retrieved UI elements.
     """
 
-    def __init__(self, emulator_id="emulator-5554", task="airplane", exploration_mode="full_exploration", episode_timesteps=100, max_current_ui_options=20):
+    def __init__(self, emulator_id="emulator-5554", task="airplane", exploration_mode="full_exploration", episode_timesteps=100, max_current_ui_options=20, vocabulary_path=None,
+                 speculation=False, speculation_min_count=3, speculation_confidence=0.9, speculation_max_entries=10000,
+                 observation_mode="ui_ids",
+                 ui_vocabulary=None):
         """
         Initializes and setups the Android environment.
 
         Args:
             emulator_id (str):              The ID of the Android emulator to interact with. Defaults to "emulator-5554".
-            task (str):                     The task to perform. Currently, it only supports the "airplane" or "youtube".
+            task (str):                     The task to perform, the name of a specification in `environment/tasks`
+                                            (currently "airplane" or "youtube") or the path to a specification file.
                                             Defaults to "airplane".
             exploration_mode (str):         Exploration mode of the agent, also affecting the reward structure.
                                             Possible modes: "guided_restricted", "guided_open", "full_exploration".
@@ -28,6 +34,23 @@ class AndroidEnv(gym.Env):
             episode_timesteps (int):        The maximum number of steps performed per episode. Defaults to 100.
             max_current_ui_options (int):   The maximum number of possible UI-options that can be processed.
                                             Defaults to 20.
+            vocabulary_path (str):          Directory of a persistent UI vocabulary shared across runs and workers,
+                                            which keeps the IDs of the UI elements stable. Defaults to None, which
+                                            keeps the vocabulary in memory.
+            speculation (bool):             Whether to return the predicted observation of a well-known transition
+                                            immediately and to verify it against the real dump in the background.
+                                            Defaults to False.
+            speculation_min_count (int):    The number of observed transitions required for a prediction. Defaults to 3.
+            speculation_confidence (float): The share of the observed transitions that must have led to the predicted
+                                            screen. Defaults to 0.9.
+            speculation_max_entries (int):  The maximum number of known transitions and of cached dumps, the least
+                                            recently used ones are evicted. Defaults to 10000.
+            observation_mode (str):         "ui_ids" observes the IDs of the UI options, "ui_text" additionally their
+                                            UTF-8 encoded texts, which allows to generalize across unseen elements.
+                                            Defaults to "ui_ids".
+            ui_vocabulary (UIVocabulary):   An existing vocabulary shared with other environments in this process,
+                                            which is used instead of `vocabulary_path` and not closed by this
+                                            environment. Defaults to None.
         """
         self.emulator_id = emulator_id
         self.max_current_ui_options = max_current_ui_options
@@ -35,6 +58,9 @@ class AndroidEnv(gym.Env):
         self.max_text_length = 20
         self.max_total_ui_options = 25000
         self.exploration_mode = exploration_mode
+        if observation_mode not in ("ui_ids", "ui_text"):
+            raise ValueError("Unknown observation mode: {0}".format(observation_mode))
+        self.observation_mode = observation_mode
 
         # By default, the actions are tapping on the UI elements, additional gestures can be added if required.
         self.additional_gestures = {
@@ -49,26 +75,38 @@ class AndroidEnv(gym.Env):
         }
 
         # Enable specific gestures if the task requires them
-        # Assign the specific task required to access the correct reset and reward method
-        if task == "airplane":
-            self.additional_gestures["swipe up"] = True
-            self.additional_gestures["swipe from top"] = True
-            self.max_current_ui_options += 1
-            self.token = "airplane"
-            self.task = AirplaneTask(emulator_id=emulator_id, token=self.token, exploration_mode=self.exploration_mode, episode_timesteps=self.episode_timesteps)
-        if task == "youtube":
-            self.additional_gestures["swipe up"] = True
-            self.max_current_ui_options += 1
-            self.token = "Charlie\ bit\ my\ finger!\ ORIGINAL"
-            self.task = YoutubeTask(emulator_id=emulator_id, token=self.token, exploration_mode=self.exploration_mode, episode_timesteps=self.episode_timesteps)
+        # Compile the specification of the task, which provides the reset and reward method
+        task_spec = load_task_spec(task)
+        for gesture in task_spec.get("gestures", []):
+            if gesture not in self.additional_gestures:
+                raise ValueError("Unknown gesture: {0}".format(gesture))
+            self.additional_gestures[gesture] = True
+        self.max_current_ui_options += task_spec.get("additional_ui_options", 0)
+        self.token = task_spec["token"].replace(" ", "\\ ")   # Escaped for the shell of the emulator
+        self.task = CompiledTask(task_spec, emulator_id=emulator_id, exploration_mode=self.exploration_mode, episode_timesteps=self.episode_timesteps, adb=self._adb)
 
         self.obs = {}
         self.obs_history = []# Current observation
-        self.ui_options_total = self._process_additional_gestures()   # List of UI elements
+        self.shared_vocabulary = ui_vocabulary is not None
+        self.ui_vocabulary = ui_vocabulary if self.shared_vocabulary else UIVocabulary(vocabulary_path, capacity=self.max_total_ui_options - 1)  # IDs of UI elements
+        self._process_additional_gestures()   # Gestures are the first elements of a new vocabulary
+        self.extractor = IncrementalExtractor(self.ui_vocabulary)    # Reuses unchanged subtrees of the previous dump
         self.ui_options_current = []
+        self.ui_changes = {"changed": False, "appeared": [], "disappeared": []}   # Changes of the last dump
         self.current_step = 0   # Current step in the episode
         self.episode_rewards = 0
 
+        # Speculative observations: (screen fingerprint, ui_option_id) -> counts of the following screens
+        self.speculation = speculation
+        self.speculation_min_count = speculation_min_count
+        self.speculation_confidence = speculation_confidence
+        self.speculation_max_entries = speculation_max_entries
+        self.fingerprint = None     # Package and UI options of the current screen
+        self.transitions = OrderedDict()    # In the order of their last use
+        self.screen_dumps = OrderedDict()   # Screen fingerprint -> latest dump of a screen which can be predicted
+        self.pending_speculation = None
+        self.reset_speculation_stats()
+
         # Define the action space
         self.action_space = spaces.Discrete(self.max_current_ui_options)
 
@@ -77,6 +115,13 @@ class AndroidEnv(gym.Env):
             "ui_options": spaces.MultiDiscrete([self.max_total_ui_options] * self.max_current_ui_options),  # Aktuelle UI-Optionen
             "history": spaces.MultiDiscrete([self.max_total_ui_options] * self.episode_timesteps)  # Vergangene Aktionen
         })
+        if self.observation_mode == "ui_text":
+            self.observation_space["ui_text"] = spaces.Box(0, 255, shape=(self.max_current_ui_options, self.max_text_length), dtype=np.uint8)
+
+        # Encoded texts of the vocabulary IDs, each text is encoded once when its ID first appears (ID 0 is padding)
+        self.text_encodings = np.zeros((self.max_total_ui_options, self.max_text_length), dtype=np.uint8)
+        self.text_encoded = np.zeros(self.max_total_ui_options, dtype=bool)
+        self.text_encoded[0] = True
 
         print("Initializing emulator: {0}".format(emulator_id))
 
@@ -91,7 +136,8 @@ class AndroidEnv(gym.Env):
         Returns:
             Tuple[dict, dict]: Initial observation and additional info.
         """
-        print("Reset, Length: ", len(self.ui_options_total))
+        print("Reset, Length: ", len(self.ui_vocabulary))
+        self._resolve_speculation(resync=False)     # The device must finish the last action before the reset
         self.current_step = 0
         self.episode_rewards = 0
         info = {}
@@ -99,18 +145,20 @@ class AndroidEnv(gym.Env):
         self.ui_options_current = self._process_additional_gestures()
 
         # Force Android-emulator to return to the home screen
-        os.system("adb -s {0} shell input keyevent KEYCODE_HOME".format(self.emulator_id))
-        time.sleep(0.2)
+        self._adb("shell input keyevent KEYCODE_HOME")
+        self._wait(0.2)
         self.task.reset_task()  # Reset the specific task
         # Scan the UI-elements and export them into a XML-file
-        os.system("adb -s {0} shell uiautomator dump".format(self.emulator_id))
-        os.system("adb -s {0} pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
-        time.sleep(2)
+        self._adb("shell uiautomator dump")
+        self._adb("pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
+        self._wait(2)
 
         self.obs = {
             "ui_options": np.zeros(self.max_current_ui_options, dtype=np.int32),
             "history": np.zeros(self.episode_timesteps, dtype=np.int32)
         }
+        if self.observation_mode == "ui_text":
+            self.obs["ui_text"] = np.zeros((self.max_current_ui_options, self.max_text_length), dtype=np.uint8)
 
         self._get_obs() # Populate the initial observation
 
@@ -126,10 +174,24 @@ class AndroidEnv(gym.Env):
         Returns:
             Tuple[dict, float, bool, bool, dict]: Observation, reward, done, truncated and info.
         """
+        # Verify the prediction of the previous step, a misprediction discards the action chosen on its observation.
+        # The rollback step costs the normal step penalty, so that actions on mispredicted screens aren't cheaper
+        # than real steps for the learner, and isn't counted as a step of the episode.
+        if self._resolve_speculation(resync=True):
+            print("Speculation rollback, the action is discarded")
+            info = {
+                "ui_changed": self.ui_changes["changed"],
+                "ui_appeared": [ui_option["text"] for ui_option in self.ui_changes["appeared"]],
+                "ui_disappeared": [ui_option["text"] for ui_option in self.ui_changes["disappeared"]],
+                "speculation_rollback": True,
+            }
+            return self.obs, -1, False, False, info
+
         self.current_step += 1
         print("Step", self.current_step)
         reward = -1
         done = False
+        self.ui_changes = {"changed": False, "appeared": [], "disappeared": []}
 
         # Map the action to a UI element
         action, action_text, bounds, action_eval = self._map_action(action)
@@ -143,8 +205,7 @@ class AndroidEnv(gym.Env):
 
             if action_text != "Power menu" and action_text != "Emergency":
                 if reward >= 0 or self.exploration_mode == "full_exploration" or self.exploration_mode == "guided_open":
-                    self._perform_action(bounds)  # Perform the action on the emulator if valid
-                    self._get_obs()  # Get new observation
+                    self._execute_action(bounds, action_text)  # Perform the action on the emulator and get the new observation
                 elif self.exploration_mode == "guided_restricted":
                     action_eval = "wrong"
 
@@ -159,7 +220,57 @@ class AndroidEnv(gym.Env):
         if self.current_step == self.episode_timesteps:
             done = True
 
-        return self.obs, reward, done, False, {}
+        info = {
+            "ui_changed": self.ui_changes["changed"],
+            "ui_appeared": [ui_option["text"] for ui_option in self.ui_changes["appeared"]],
+            "ui_disappeared": [ui_option["text"] for ui_option in self.ui_changes["disappeared"]],
+            "speculation_rollback": False,
+        }
+
+        return self.obs, reward, done, False, info
+
+    def close(self):
+        """
+        Wait for a pending action and release the UI vocabulary, unless it is shared.
+        """
+        self._resolve_speculation(resync=False)
+        if not self.shared_vocabulary:
+            self.ui_vocabulary.close()
+
+    def speculation_stats(self):
+        """
+        Returns the statistics of the speculative observations.
+
+        Returns:
+            stats (dict): Number of speculations, hits and misses, the hit rate, the dump latency (in seconds) hidden by
+                          the hits, the time lost by resyncing after misses and the number of known transitions.
+        """
+        stats = dict(self.speculation_counts)
+        resolved = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / resolved if resolved else 0.0
+        stats["transitions"] = len(self.transitions)
+        return stats
+
+    def reset_speculation_stats(self):
+        self.speculation_counts = {"speculations": 0, "hits": 0, "misses": 0, "hidden_latency_s": 0.0, "misprediction_cost_s": 0.0}
+
+    def _adb(self, command):
+        """
+        Execute an adb command on the emulator of this environment.
+
+        Args:
+            command (str): The adb command without the "adb -s <emulator_id>" prefix, e.g. "shell input tap 10 10".
+        """
+        os.system("adb -s {0} {1}".format(self.emulator_id, command))
+
+    def _wait(self, seconds):
+        """
+        Wait for the emulator to process the previous commands, e.g. to finish the animations before a dump.
+
+        Args:
+            seconds (float): The time to wait.
+        """
+        time.sleep(seconds)
 
     def _process_additional_gestures(self):
         """
@@ -174,14 +285,14 @@ class AndroidEnv(gym.Env):
             if self.additional_gestures[gesture]:
                 if gesture == "swipe up":
                     gesture_data = {
-                        "id": len(gesture_list) + 1,
+                        "id": self.ui_vocabulary.add(gesture, ""),
                         "text": gesture,
                         "bounds": (540, 960, 540, 200)
                     }
                     gesture_list.append(gesture_data)
                 elif gesture == "swipe from top":
                     gesture_data = {
-                        "id": len(gesture_list) + 1,
+                        "id": self.ui_vocabulary.add(gesture, ""),
                         "text": gesture,
                         "bounds": (540, 0, 540, 960)
                     }
@@ -189,27 +300,55 @@ class AndroidEnv(gym.Env):
 
         return gesture_list
 
-    def _get_obs(self):
+    def _get_obs(self, xml_data=None):
         """
         Update the observation space by reading the emulator's current UI state.
+
+        Args:
+            xml_data (bytes): The dump of the UI. Defaults to None, which reads the dump of the emulator.
+
+        Returns:
+            xml_data (bytes): The dump of the UI.
+        """
+        if xml_data is None:
+            xml_data = self._read_dump()
+        root = ET.fromstring(xml_data)
+        ui_options, ui_changes = self.extractor.extract(root)   # Extract new UI-elements
+        self._apply_obs(root, ui_options, ui_changes)
+        return xml_data
+
+    def _read_dump(self):
+        """
+        Read the XML dump of the current UI.
+
+        Returns:
+            xml_data (bytes): The dump of the UI.
         """
-        # Read the XML dump of the current UI
         try:
            with open('window_emulator_{0}.xml'.format(self.emulator_id), 'rb') as f:
                 xml_data = f.read()
         except:
-            os.system("adb -s {0} shell uiautomator dump".format(self.emulator_id))
-            time.sleep(10)
-            os.system("adb -s {0} pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
-            time.sleep(10)
+            self._adb("shell uiautomator dump")
+            self._wait(10)
+            self._adb("pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
+            self._wait(10)
             with open('window_emulator_{0}.xml'.format(self.emulator_id), 'rb') as f:
                 xml_data = f.read()
             print("Exception")
+        return xml_data
 
-        root = ET.fromstring(xml_data)
+    def _apply_obs(self, root, ui_options, ui_changes):
+        """
+        Update the observation and the history with the extracted UI options of a dump.
 
-        self.ui_options_current = self._process_additional_gestures()    # Clear previous UI options # Add additional gestures
-        self._extract_nodes(root)   # Extract new UI-elements
+        Args:
+            root (Element): Root of the XML hierarchy.
+            ui_options (list): The extracted UI options.
+            ui_changes (dict): The changes compared to the previous dump.
+        """
+        self.ui_changes = ui_changes
+        self.ui_options_current = self._process_additional_gestures() + ui_options    # Add additional gestures
+        self.fingerprint = self._get_fingerprint(root, self.ui_options_current)
 
         # Process and update the UI options
         self.obs["ui_options"] = np.zeros(self.max_current_ui_options, dtype=np.int32)
@@ -217,6 +356,8 @@ class AndroidEnv(gym.Env):
         for ui_option in self.ui_options_current[:self.max_current_ui_options]:
             self.obs["ui_options"][index] = ui_option["id"]
             index += 1
+        if self.observation_mode == "ui_text":
+            self.obs["ui_text"] = self._get_text_obs(self.obs["ui_options"], self.ui_options_current)
 
         if self.current_step == 0:
             self.obs_history[-1]["package"] = root.find('node').get("package").split(".")[-1]
@@ -224,104 +365,166 @@ class AndroidEnv(gym.Env):
             self.obs_history[-1]["ui_options"] = self.obs["ui_options"]
             self._get_menu_history()
             self.obs_history.append({"package": root.find('node').get("package").split(".")[-1]})
+        self.obs_history[-1]["ui_changed"] = self.ui_changes["changed"]   # Whether the last action changed the screen
 
-    def _extract_nodes(self, node):
+    def _get_fingerprint(self, root, ui_options):
         """
-        Recursively extract relevant UI elements from the XML node.
+        Identifies a screen by its package and UI options, ignoring e.g. the clock.
+        """
+        return root.find('node').get("package"), tuple((ui_option["id"], ui_option["bounds"]) for ui_option in ui_options)
 
-        Possible data to extract: index, text, resource_id, class, package, content_desc, checkable, checked, clickable,
-                         enabled, focusable, scrollable, long-clickable, password, selected, bounds
+    def _execute_action(self, bounds, action_text):
+        """
+        Perform an action and update the observation. If the resulting screen of the action is well known, the
+        predicted observation is used immediately and the action is performed in the background.
 
         Args:
-            node (Element): XML node representing a UI element.
+            bounds (tuple): The coordinates of the UI-element or for the gesture action.
+            action_text (str): The text of the UI-element or gesture.
         """
-        node_clickable = node.get("clickable")
-
-        if node_clickable == "true" and not node.get("resource-id").endswith("clock"):
-            element_name = self._extract_element_name(node)
-            node_bounds = re.findall(r'\d+', node.get("bounds"))
-            node_bounds = tuple(map(int, node_bounds))
-            node_package = node.get("package").split(".")[-1]
-
-            node_class = node.get("class")
-            if "EditText" in node_class:
-                element_name = f"Text field {element_name}"
-
-            if node_bounds != (0, 0, 0, 0):
-                node_data = {
-                    "id": len(self.ui_options_total) + 1,
-                    "text": element_name,
-                    "bounds": node_bounds,
-                    "package": node_package,
-                }
-
-                duplicate = False
-                for ui_option in self.ui_options_total:
-                    # ui_option = self._process_ui_options()
-                    if ui_option["text"] == element_name and ui_option["package"] == node_package:
-                        duplicate = True
-                        node_data["id"] = ui_option["id"]
-                        break
-
-                if not duplicate:
-                    self.ui_options_total.append(node_data)
-                self.ui_options_current.append(node_data)
-
-        # # Process child nodes recursively
-        for child in node.findall('node'):
-            self._extract_nodes(child)
+        if not self.speculation:
+            self._perform_action(bounds, action_text)
+            self._get_obs()
+            return
+
+        previous = self.fingerprint
+        ui_option_id = self.obs_history[-1]["ui_option_id"]
+        prediction = self._predict_transition(previous, ui_option_id)
+        if prediction is None:
+            self._perform_action(bounds, action_text)
+            xml_data = self._get_obs()
+            self._record_transition(previous, ui_option_id, self.fingerprint, xml_data)
+            return
+
+        # Snapshot of the state before the observation, which is restored on a misprediction
+        snapshot = {
+            "obs": {key: value.copy() for key, value in self.obs.items()},
+            "obs_history": [dict(history) for history in self.obs_history],
+            "extractor": (self.extractor.previous_subtrees, self.extractor.previous_options, self.extractor.previous_hash),
+        }
+        result = {}
+        thread = threading.Thread(target=self._perform_action_async, args=(bounds, action_text, result), daemon=True)
+        thread.start()
+        self.pending_speculation = {"thread": thread, "result": result, "snapshot": snapshot, "previous": previous,
+                                    "ui_option_id": ui_option_id, "prediction": prediction}
+        self.speculation_counts["speculations"] += 1
+        self._get_obs(self.screen_dumps[prediction])
+
+    def _perform_action_async(self, bounds, action_text, result):
+        start = time.perf_counter()
+        try:
+            self._perform_action(bounds, action_text)
+            result["xml_data"] = self._read_dump()
+        except Exception as error:
+            result["error"] = error
+        result["duration"] = time.perf_counter() - start
 
-    def _extract_element_name(self, node):
+    def _predict_transition(self, fingerprint, ui_option_id):
         """
-        Extracts the name of a UI element from the XML node.
+        Predict the screen following an action.
 
-        Args:
-            node (Element): XML node representing a UI element.
-            
         Returns:
-            element_name (str): name of the UI element.
+            prediction (tuple): The fingerprint of the predicted screen or None if the transition isn't well known.
         """
-        element_name = ""
-        node_text = node.get("text")
-        node_content_desc = node.get("content-desc")
-
-        if node_text != "":
-            element_name = node_text
-        elif node_content_desc != "":
-            element_name = node_content_desc
-        else:
-            for child in node.findall('node'):
-                element_name = self._extract_element_name(child)
-                if element_name != "":
-                    break
+        counts = self.transitions.get((fingerprint, ui_option_id))
+        if not counts:
+            return None
+        prediction, count = counts.most_common(1)[0]
+        total = sum(counts.values())
+        if (total >= self.speculation_min_count and count / total >= self.speculation_confidence
+                and prediction in self.screen_dumps):
+            self.transitions.move_to_end((fingerprint, ui_option_id))
+            self.screen_dumps.move_to_end(prediction)
+            return prediction
+        return None
+
+    def _record_transition(self, previous, ui_option_id, fingerprint, xml_data):
+        """
+        Count a transition and keep the dump of its screen once the transition is about to be predicted.
+        Both tables are bounded by evicting their least recently used entries, e.g. the screens of scrolled lists.
+        """
+        key = (previous, ui_option_id)
+        counts = self.transitions.setdefault(key, Counter())
+        counts[fingerprint] += 1
+        self.transitions.move_to_end(key)
+        if len(self.transitions) > self.speculation_max_entries:
+            self.transitions.popitem(last=False)
+
+        if counts[fingerprint] >= self.speculation_min_count - 1:
+            self.screen_dumps[fingerprint] = xml_data
+            self.screen_dumps.move_to_end(fingerprint)
+            if len(self.screen_dumps) > self.speculation_max_entries:
+                self.screen_dumps.popitem(last=False)
+
+    def _resolve_speculation(self, resync):
+        """
+        Wait for the action of a speculative step and verify the predicted observation against the real dump.
+        On a misprediction the observation and history are rolled back and replaced by the real screen.
 
-        return element_name
+        Args:
+            resync (bool): Whether to replace the observation on a misprediction, not required e.g. before a reset.
 
-    def _perform_action(self, bounds):
+        Returns:
+            rollback (bool): Whether the observation was rolled back.
+        """
+        pending = self.pending_speculation
+        if pending is None:
+            return False
+        self.pending_speculation = None
+        start = time.perf_counter()
+        pending["thread"].join()
+        waited = time.perf_counter() - start
+        result = pending["result"]
+        if "error" in result:
+            raise result["error"]
+
+        # Extract the real screen relative to the screen before the action
+        snapshot = pending["snapshot"]
+        self.extractor.previous_subtrees, self.extractor.previous_options, self.extractor.previous_hash = snapshot["extractor"]
+        root = ET.fromstring(result["xml_data"])
+        ui_options, ui_changes = self.extractor.extract(root)
+        fingerprint = self._get_fingerprint(root, self._process_additional_gestures() + ui_options)
+        self._record_transition(pending["previous"], pending["ui_option_id"], fingerprint, result["xml_data"])
+
+        if fingerprint == pending["prediction"]:
+            self.speculation_counts["hits"] += 1
+            self.speculation_counts["hidden_latency_s"] += max(result["duration"] - waited, 0.0)
+            return False
+
+        self.speculation_counts["misses"] += 1
+        self.transitions[(pending["previous"], pending["ui_option_id"])].pop(pending["prediction"], None)  # e.g. the app changed
+        if resync:
+            self.obs = snapshot["obs"]
+            self.obs_history = snapshot["obs_history"]
+            self._apply_obs(root, ui_options, ui_changes)
+        self.speculation_counts["misprediction_cost_s"] += time.perf_counter() - start
+        return resync
+
+    def _perform_action(self, bounds, action_text):
         """
         Perform an action (e.g. tap or swipe) on the emulator.
 
         Args:
             bounds (tuple): The coordinates of the UI-element or for the gesture action.
+            action_text (str): The text of the UI-element or gesture.
         """
-        action_text = self.obs_history[-1]["action_text"]
         if action_text.startswith("swipe"):
-            os.system("adb -s {4} shell input swipe {0} {1} {2} {3}".format(bounds[0], bounds[1], bounds[2], bounds[3], self.emulator_id))
-            time.sleep(1)
+            self._adb("shell input swipe {0} {1} {2} {3}".format(bounds[0], bounds[1], bounds[2], bounds[3]))
+            self._wait(1)
         elif action_text.startswith("Text field"):
-            os.system("adb -s {1} shell input text '{0}'".format(self.token, self.emulator_id))
-            os.system("adb -s {0} shell input keyevent ENTER".format(self.emulator_id))
+            self._adb("shell input text '{0}'".format(self.token))
+            self._adb("shell input keyevent ENTER")
         else:
             coord_x = int((bounds[0] + bounds[2]) / 2)
             coord_y = int((bounds[1] + bounds[3]) / 2)
-            os.system("adb -s {2} shell input tap {0} {1}".format(coord_x, coord_y, self.emulator_id))
+            self._adb("shell input tap {0} {1}".format(coord_x, coord_y))
 
         # Execute the command and update the UI state by extracting the UI-elements on the new screen
-        time.sleep(1)
-        os.system("adb -s {0} shell uiautomator dump".format(self.emulator_id))
-        time.sleep(0.3)
-        os.system("adb -s {0} pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
-        time.sleep(0.5)
+        self._wait(1)
+        self._adb("shell uiautomator dump")
+        self._wait(0.3)
+        self._adb("pull /sdcard/window_dump.xml window_emulator_{0}.xml".format(self.emulator_id))
+        self._wait(0.5)
 
     def _map_action(self, action):
         """
@@ -374,37 +577,35 @@ class AndroidEnv(gym.Env):
                         self.obs["history"][index] = current_ui_option_id
             index += 1
 
-    def _process_ui_options(self):
+    def _get_text_obs(self, ids, ui_options):
         """
-        Process the UI options and create observation arrays for "index" and "text".
+        Gather the encoded texts of the current UI options from the encoding table, new IDs are encoded once.
+
+        Args:
+            ids (np.ndarray): The IDs of the UI options in the observation.
+            ui_options (list): The UI options of the IDs, providing the texts of new IDs.
 
         Returns:
-            ui_options (dict): A dictionary containing the processed "index" and "text" arrays.
+            text_array (np.ndarray): The encoded texts of shape (max_current_ui_options, max_text_length).
         """
-        # Initialize arrays with default values (-1)
-        text_array = -1 * np.ones((self.max_current_ui_options, self.max_text_length), dtype=np.uint8)  # Für "text"
+        if not self.text_encoded.take(ids).all():
+            new = np.flatnonzero(~self.text_encoded[ids])
+            new_ids = ids[new]
+            self.text_encodings[new_ids] = encode_texts([ui_options[i]["text"] for i in new], self.max_text_length)
+            self.text_encoded[new_ids] = True
+        return self.text_encodings.take(ids, axis=0)
 
-        # Populate arrays with actual data from UI options
-        for i, obj in enumerate(self.ui_options[:self.max_current_ui_options]):
-            encoded_text = self._encode_text(obj["text"])
-            text_array[i, :len(encoded_text)] = encoded_text
 
-        ui_options = {
-            "text": text_array,
-        }
-        return ui_options
-
-    def _encode_text(self, text):
-        """
-        Additional feature to encode the UI-text into numeric array to allow the processing of the observation_space.
+def encode_texts(texts, max_text_length):
+    """
+    Encode texts into fixed-width arrays of their UTF-8 bytes, truncated or padded with zeros.
 
-        Args:
-            text (str): The text to encode.
+    Args:
+        texts (list): The texts to encode.
+        max_text_length (int): The number of bytes per text.
 
-        Returns:
-            encoded (np.ndarray): Encoded text as a numeric array.
-        """
-        encoded = np.zeros((self.max_text_length,), dtype=np.uint8)
-        for i, char in enumerate(text[:self.max_text_length]):
-            encoded[i] = ord(char)   # Convert character to ASCII
-        return encoded
+    Returns:
+        encoded (np.ndarray): The encoded texts as uint8 array of shape (len(texts), max_text_length).
+    """
+    encoded = np.array([text.encode("utf-8") for text in texts], dtype="S{0}".format(max_text_length))
+    return encoded.view(np.uint8).reshape(len(texts), max_text_length)
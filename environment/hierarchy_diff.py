@@ -0,0 +1,131 @@
+import re
+
+
+def extract_element_name(node):
+    """
+    Extracts the name of a UI element from the XML node.
+
+    Args:
+        node (Element): XML node representing a UI element.
+
+    Returns:
+        element_name (str): name of the UI element.
+    """
+    element_name = ""
+    node_text = node.get("text")
+    node_content_desc = node.get("content-desc")
+
+    if node_text != "":
+        element_name = node_text
+    elif node_content_desc != "":
+        element_name = node_content_desc
+    else:
+        for child in node.findall('node'):
+            element_name = extract_element_name(child)
+            if element_name != "":
+                break
+
+    return element_name
+
+
+class IncrementalExtractor:
+    """
+    Extracts the UI options of a view hierarchy and reuses the results of the previous dump for unchanged subtrees.
+
+    Every subtree is identified by a content hash of its attributes (resource-id, class, bounds, text, ...) and the
+    hashes of its children. Only nodes whose subtree changed since the previous dump are extracted again, and the
+    options that appeared or disappeared are reported.
+    """
+
+    def __init__(self, vocabulary):
+        """
+        Initializes the extractor.
+
+        Args:
+            vocabulary (UIVocabulary): The vocabulary assigning the IDs of the UI options.
+        """
+        self.vocabulary = vocabulary
+        self.previous_subtrees = {}   # Subtree hash -> UI options of the subtree
+        self.previous_options = {}    # (id, bounds) -> UI option of the previous dump
+        self.previous_hash = None
+
+    def extract(self, root):
+        """
+        Extracts the UI options of a hierarchy.
+
+        Possible data to extract: index, text, resource_id, class, package, content_desc, checkable, checked, clickable,
+                         enabled, focusable, scrollable, long-clickable, password, selected, bounds
+
+        Args:
+            root (Element): Root of the XML hierarchy.
+
+        Returns:
+            Tuple[list, dict]: The UI options in document order and the changes compared to the previous dump
+                               ("changed", "appeared" and "disappeared", the latter two as lists of UI options).
+        """
+        subtrees = {}
+        root_hash, ui_options = self._extract_subtree(root, subtrees)
+
+        current_options = {(ui_option["id"], ui_option["bounds"]): ui_option for ui_option in ui_options}
+        if root_hash == self.previous_hash:
+            changes = {"changed": False, "appeared": [], "disappeared": []}
+        else:
+            changes = {
+                "changed": True,
+                "appeared": [ui_option for key, ui_option in current_options.items() if key not in self.previous_options],
+                "disappeared": [ui_option for key, ui_option in self.previous_options.items() if key not in current_options],
+            }
+
+        self.previous_subtrees = subtrees
+        self.previous_options = current_options
+        self.previous_hash = root_hash
+        return ui_options, changes
+
+    def _extract_subtree(self, node, subtrees):
+        """
+        Recursively extract relevant UI elements from the XML node and its children.
+
+        Returns:
+            Tuple[int, list]: The content hash of the subtree and its UI options.
+        """
+        children = [self._extract_subtree(child, subtrees) for child in node.findall('node')]
+        subtree_hash = hash((tuple(node.attrib.items()), tuple(child_hash for child_hash, _ in children)))
+
+        ui_options = self.previous_subtrees.get(subtree_hash)
+        if ui_options is None:
+            ui_option = self._extract_node(node)
+            ui_options = [ui_option] if ui_option is not None else []
+            for _, child_options in children:
+                ui_options.extend(child_options)
+
+        subtrees[subtree_hash] = ui_options
+        return subtree_hash, ui_options
+
+    def _extract_node(self, node):
+        """
+        Extracts the UI option of a single node.
+
+        Returns:
+            ui_option (dict): The UI option or None if the node is not clickable.
+        """
+        node_clickable = node.get("clickable")
+
+        if node_clickable == "true" and not node.get("resource-id").endswith("clock"):
+            element_name = extract_element_name(node)
+            node_bounds = re.findall(r'\d+', node.get("bounds"))
+            node_bounds = tuple(map(int, node_bounds))
+            node_package = node.get("package").split(".")[-1]
+
+            node_class = node.get("class")
+            if "EditText" in node_class:
+                element_name = f"Text field {element_name}"
+
+            if node_bounds != (0, 0, 0, 0):
+                return {
+                    "id": self.vocabulary.add(element_name, node_package),
+                    "text": element_name,
+                    "bounds": node_bounds,
+                    "package": node_package,
+                }
+
+        return None
@@ -0,0 +1,461 @@
+import argparse
+import json
+import socket
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import gymnasium as gym
+from gymnasium import spaces
+import numpy as np
+from environment.ui_vocabulary import UIVocabulary
+
+
+# Every frame starts with the payload length and an opcode, followed by an opcode specific body.
+_FRAME_HEADER = struct.Struct("!IB")
+_RESET_REQUEST = struct.Struct("!HBq")      # slot, has_seed, seed (+ JSON options)
+_STEP_COUNT = struct.Struct("!H")           # number of (slot, action) pairs in a step request
+_STEP_ACTION = struct.Struct("!Hq")         # slot, action
+_STEP_RESULT = struct.Struct("!dBBI")       # reward, terminated, truncated, length of the JSON info
+
+# Default port of the server, outside the adb ports of the emulators (5554-5585) it runs next to
+DEFAULT_PORT = 7100
+
+OP_HELLO = 0
+OP_RESET = 1
+OP_STEP = 2
+OP_CLOSE = 3
+OP_ERROR = 255
+
+
+def _describe_space(space):
+    """
+    Describes a Gymnasium space as a JSON-serializable dictionary, which is sent once during the handshake.
+
+    Args:
+        space (gym.Space): The space to describe. Supports Dict, Discrete, MultiDiscrete and Box spaces.
+
+    Returns:
+        description (dict): The JSON-serializable description of the space.
+    """
+    if isinstance(space, spaces.Dict):
+        return {"type": "Dict", "spaces": {key: _describe_space(subspace) for key, subspace in space.spaces.items()}}
+    if isinstance(space, spaces.Discrete):
+        return {"type": "Discrete", "n": int(space.n)}
+    if isinstance(space, spaces.MultiDiscrete):
+        return {"type": "MultiDiscrete", "nvec": space.nvec.tolist(), "dtype": str(space.dtype)}
+    if isinstance(space, spaces.Box):
+        return {"type": "Box", "low": space.low.tolist(), "high": space.high.tolist(),
+                "shape": list(space.shape), "dtype": str(space.dtype)}
+    raise ValueError("Unsupported space for remote environments: {0}".format(space))
+
+
+def _build_space(description):
+    """
+    Rebuilds a Gymnasium space from the description created by `_describe_space`.
+
+    Args:
+        description (dict): The description of the space.
+
+    Returns:
+        space (gym.Space): The rebuilt space.
+    """
+    if description["type"] == "Dict":
+        return spaces.Dict({key: _build_space(subspace) for key, subspace in description["spaces"].items()})
+    if description["type"] == "Discrete":
+        return spaces.Discrete(description["n"])
+    if description["type"] == "MultiDiscrete":
+        return spaces.MultiDiscrete(description["nvec"], dtype=description["dtype"])
+    if description["type"] == "Box":
+        return spaces.Box(low=np.array(description["low"]), high=np.array(description["high"]),
+                          shape=tuple(description["shape"]), dtype=description["dtype"])
+    raise ValueError("Unsupported space description: {0}".format(description["type"]))
+
+
+def _json_default(value):
+    """
+    Converts NumPy values in info dictionaries into JSON-serializable Python values.
+    """
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return str(value)
+
+
+def _encode_info(info):
+    return json.dumps(info, default=_json_default).encode("utf-8") if info else b""
+
+
+def _decode_info(data):
+    return json.loads(data) if data else {}
+
+
+class ObservationCodec:
+    """
+    Compact binary encoding of observations. The observation space is fixed for the lifetime of an environment,
+    so the arrays are sent back to back as raw bytes without any per-step metadata.
+    """
+
+    def __init__(self, observation_space):
+        """
+        Initializes the codec.
+
+        Args:
+            observation_space (gym.Space): A Dict space or a single Box/MultiDiscrete space.
+        """
+        if isinstance(observation_space, spaces.Dict):
+            items = observation_space.spaces.items()
+        else:
+            items = [(None, observation_space)]
+
+        self.fields = []
+        self.nbytes = 0
+        for key, space in items:
+            dtype = np.dtype(space.dtype)
+            shape = tuple(space.shape)
+            size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            self.fields.append((key, dtype, shape, size))
+            self.nbytes += size
+
+    def encode(self, obs):
+        """
+        Encodes an observation into bytes.
+
+        Args:
+            obs (dict | np.ndarray): The observation.
+
+        Returns:
+            data (bytes): The encoded observation.
+        """
+        if len(self.fields) == 1 and self.fields[0][0] is None:
+            return np.ascontiguousarray(obs, dtype=self.fields[0][1]).tobytes()
+        return b"".join(np.ascontiguousarray(obs[key], dtype=dtype).tobytes() for key, dtype, _, _ in self.fields)
+
+    def decode(self, data, offset=0):
+        """
+        Decodes an observation from bytes.
+
+        Args:
+            data (bytes): The buffer holding the encoded observation.
+            offset (int): Position of the observation in the buffer. Defaults to 0.
+
+        Returns:
+            obs (dict | np.ndarray): The decoded observation.
+        """
+        obs = {}
+        for key, dtype, shape, size in self.fields:
+            array = np.frombuffer(data, dtype=dtype, count=size // dtype.itemsize, offset=offset).reshape(shape).copy()
+            offset += size
+            if key is None:
+                return array
+            obs[key] = array
+        return obs
+
+
+def _send_frame(sock, opcode, body=b""):
+    sock.sendall(_FRAME_HEADER.pack(len(body), opcode) + body)
+
+
+def _recv_frame(reader):
+    header = reader.read(_FRAME_HEADER.size)
+    if len(header) < _FRAME_HEADER.size:
+        raise ConnectionError("Connection closed by peer")
+    length, opcode = _FRAME_HEADER.unpack(header)
+    body = reader.read(length)
+    if len(body) < length:
+        raise ConnectionError("Connection closed by peer")
+    return opcode, body
+
+
+class AndroidEnvServer:
+    """
+    Hosts one or more emulator-backed environments and serves them to remote learners over a plain TCP socket.
+    Requests of a connection are processed in order, which allows clients to pipeline requests. A step request
+    can contain actions for several environments, which are then stepped concurrently.
+    """
+
+    def __init__(self, envs, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Initializes the server.
+
+        Args:
+            envs (list):    The environments to host. The position in the list is the slot used by the clients.
+            host (str):     The address to bind to. Defaults to "127.0.0.1".
+            port (int):     The port to bind to, 0 picks a free port. Defaults to 7100.
+        """
+        self.envs = list(envs)
+        self.env_locks = [threading.Lock() for _ in self.envs]
+        self.codec = ObservationCodec(self.envs[0].observation_space)
+        self.hello = json.dumps({
+            "num_envs": len(self.envs),
+            "observation_space": _describe_space(self.envs[0].observation_space),
+            "action_space": _describe_space(self.envs[0].action_space),
+        }).encode("utf-8")
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.envs)))
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, port))
+        self.socket.listen()
+        self.address = self.socket.getsockname()
+        self._closed = False
+
+    def serve_forever(self):
+        """
+        Accepts client connections until the server is closed. Each connection is handled in its own thread.
+        """
+        print("Serving {0} environment(s) on {1}:{2}".format(len(self.envs), self.address[0], self.address[1]))
+        while not self._closed:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            thread (threading.Thread): The thread accepting the connections.
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """
+        Stops accepting connections and closes the hosted environments.
+        """
+        self._closed = True
+        self.socket.close()
+        self.executor.shutdown(wait=True)
+        for env in self.envs:
+            env.close()
+
+    def _handle_connection(self, connection):
+        reader = connection.makefile("rb")
+        try:
+            _send_frame(connection, OP_HELLO, self.hello)
+            while True:
+                opcode, body = _recv_frame(reader)
+                if opcode == OP_CLOSE:
+                    break
+                try:
+                    if opcode == OP_RESET:
+                        response = self._reset(body)
+                    elif opcode == OP_STEP:
+                        response = self._step(body)
+                    else:
+                        raise ValueError("Unknown opcode: {0}".format(opcode))
+                except Exception as error:
+                    _send_frame(connection, OP_ERROR, repr(error).encode("utf-8"))
+                else:
+                    _send_frame(connection, opcode, response)
+        except ConnectionError:
+            pass
+        finally:
+            reader.close()
+            connection.close()
+
+    def _reset(self, body):
+        slot, has_seed, seed = _RESET_REQUEST.unpack_from(body)
+        options = _decode_info(body[_RESET_REQUEST.size:]) or None
+        with self.env_locks[slot]:
+            obs, info = self.envs[slot].reset(seed=seed if has_seed else None, options=options)
+        info = _encode_info(info)
+        return struct.pack("!I", len(info)) + info + self.codec.encode(obs)
+
+    def _step_slot(self, slot, action):
+        with self.env_locks[slot]:
+            obs, reward, terminated, truncated, info = self.envs[slot].step(action)
+        info = _encode_info(info)
+        return _STEP_RESULT.pack(float(reward), bool(terminated), bool(truncated), len(info)) + info + self.codec.encode(obs)
+
+    def _step(self, body):
+        count, = _STEP_COUNT.unpack_from(body)
+        requests = [_STEP_ACTION.unpack_from(body, _STEP_COUNT.size + i * _STEP_ACTION.size) for i in range(count)]
+        if count == 1:
+            return self._step_slot(*requests[0])
+        futures = [self.executor.submit(self._step_slot, slot, action) for slot, action in requests]
+        return b"".join(future.result() for future in futures)
+
+
+class RemoteEnvClient:
+    """
+    Connection to an `AndroidEnvServer`. Requests can be sent without waiting for their responses (pipelining);
+    the responses are then received in the order the requests were sent.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=None):
+        """
+        Connects to the server and receives the spaces of the hosted environments.
+
+        Args:
+            host (str):         The address of the server. Defaults to "127.0.0.1".
+            port (int):         The port of the server. Defaults to 7100.
+            timeout (float):    Socket timeout in seconds, None blocks forever. Defaults to None.
+        """
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.socket.makefile("rb")
+        self.pending = deque()
+
+        opcode, body = _recv_frame(self.reader)
+        if opcode != OP_HELLO:
+            raise ConnectionError("Unexpected handshake from server")
+        hello = json.loads(body)
+        self.num_envs = hello["num_envs"]
+        self.observation_space = _build_space(hello["observation_space"])
+        self.action_space = _build_space(hello["action_space"])
+        self.codec = ObservationCodec(self.observation_space)
+
+    def send_reset(self, slot, seed=None, options=None):
+        """
+        Sends a reset request for an environment without waiting for the response.
+        """
+        body = _RESET_REQUEST.pack(slot, seed is not None, seed or 0) + _encode_info(options)
+        _send_frame(self.socket, OP_RESET, body)
+        self.pending.append(OP_RESET)
+
+    def send_step(self, actions):
+        """
+        Sends a batched step request without waiting for the response.
+
+        Args:
+            actions (list): (slot, action) pairs. The environments of the batch are stepped concurrently.
+        """
+        body = _STEP_COUNT.pack(len(actions)) + b"".join(_STEP_ACTION.pack(slot, int(action)) for slot, action in actions)
+        _send_frame(self.socket, OP_STEP, body)
+        self.pending.append(OP_STEP)
+
+    def receive(self):
+        """
+        Receives the response to the oldest pending request.
+
+        Returns:
+            result (tuple | list): (obs, info) for a reset request and a list of
+                                   (obs, reward, terminated, truncated, info) tuples for a step request.
+        """
+        expected = self.pending.popleft()
+        opcode, body = _recv_frame(self.reader)
+        if opcode == OP_ERROR:
+            raise RuntimeError("Remote environment failed: {0}".format(body.decode("utf-8")))
+        if opcode != expected:
+            raise ConnectionError("Unexpected response from server")
+
+        if opcode == OP_RESET:
+            info_length, = struct.unpack_from("!I", body)
+            info = _decode_info(body[4:4 + info_length])
+            return self.codec.decode(body, 4 + info_length), info
+
+        results = []
+        offset = 0
+        while offset < len(body):
+            reward, terminated, truncated, info_length = _STEP_RESULT.unpack_from(body, offset)
+            offset += _STEP_RESULT.size
+            info = _decode_info(body[offset:offset + info_length])
+            offset += info_length
+            obs = self.codec.decode(body, offset)
+            offset += self.codec.nbytes
+            results.append((obs, reward, bool(terminated), bool(truncated), info))
+        return results
+
+    def reset(self, slot, seed=None, options=None):
+        self.send_reset(slot, seed=seed, options=options)
+        return self.receive()
+
+    def step(self, actions):
+        self.send_step(actions)
+        return self.receive()
+
+    def close(self):
+        """
+        Drains the pending responses and closes the connection.
+        """
+        try:
+            while self.pending:
+                self.receive()
+            _send_frame(self.socket, OP_CLOSE)
+        except (ConnectionError, OSError):
+            pass
+        self.reader.close()
+        self.socket.close()
+
+
+class RemoteAndroidEnv(gym.Env):
+    """Gymnasium proxy for an `Android-v0` environment hosted by an `AndroidEnvServer` on another machine.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, slot=0, client=None):
+        """
+        Initializes the proxy.
+
+        Args:
+            host (str):                 The address of the server. Defaults to "127.0.0.1".
+            port (int):                 The port of the server. Defaults to 7100.
+            slot (int):                 The index of the environment hosted by the server. Defaults to 0.
+            client (RemoteEnvClient):   An existing connection to share with other proxies. Defaults to None.
+        """
+        self.owns_client = client is None
+        self.client = client if client is not None else RemoteEnvClient(host, port)
+        if slot >= self.client.num_envs:
+            raise ValueError("The server hosts only {0} environment(s)".format(self.client.num_envs))
+        self.slot = slot
+        self.observation_space = self.client.observation_space
+        self.action_space = self.client.action_space
+
+    def reset(self, seed=None, options=None):
+        """
+        Reset the remote environment and return the initial observation.
+        """
+        super().reset(seed=seed)
+        return self.client.reset(self.slot, seed=seed, options=options)
+
+    def step(self, action):
+        """
+        Perform a step in the remote environment.
+        """
+        return self.client.step([(self.slot, action)])[0]
+
+    def step_async(self, action):
+        """
+        Send the action without waiting for the result, which is received with `step_wait`.
+        """
+        self.client.send_step([(self.slot, action)])
+
+    def step_wait(self):
+        return self.client.receive()[0]
+
+    def close(self):
+        if self.owns_client:
+            self.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve emulator-backed Android environments to remote learners.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--emulator", action="append", dest="emulators",
+                        help="Emulator to host, can be repeated. Defaults to emulator-5554.")
+    parser.add_argument("--task", default="airplane")
+    parser.add_argument("--exploration-mode", default="full_exploration")
+    parser.add_argument("--episode-timesteps", type=int, default=100)
+    parser.add_argument("--vocabulary", default=None, help="Directory of the persistent UI vocabulary.")
+    args = parser.parse_args()
+
+    # One vocabulary for all hosted environments, so every slot observes the same IDs for the same UI elements
+    ui_vocabulary = UIVocabulary(args.vocabulary)
+    envs = [gym.make("Android-v0", emulator_id=emulator_id, task=args.task, exploration_mode=args.exploration_mode,
+                     episode_timesteps=args.episode_timesteps, ui_vocabulary=ui_vocabulary)
+            for emulator_id in args.emulators or ["emulator-5554"]]
+    server = AndroidEnvServer(envs, host=args.host, port=args.port)
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        ui_vocabulary.close()
+
+
+if __name__ == "__main__":
+    main()
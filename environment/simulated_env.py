@@ -0,0 +1,122 @@
+from xml.sax.saxutils import quoteattr
+from environment.android_env import AndroidEnv
+
+
+LAUNCHER = "com.google.android.apps.nexuslauncher"
+SETTINGS = "com.android.settings"
+SYSTEMUI = "com.android.systemui"
+
+
+def _leaf(package, title, parent):
+    return package, [("Navigate up", parent), (title, None), ("{0} preferences".format(title), None)]
+
+
+# Screen -> (package, [(UI element, screen reached by tapping it or None to stay on the screen)])
+SCREENS = {
+    "home": (LAUNCHER, [("Phone", "dialer"), ("Messages", "messages"), ("Chrome", "chrome"), ("Search", None)]),
+    "app_drawer": (LAUNCHER, [("Search apps", None), ("Calendar", "calendar"), ("Camera", "camera"), ("Chrome", "chrome"),
+                              ("Phone", "dialer"), ("Settings", "settings"), ("YouTube", "youtube")]),
+    "settings": (SETTINGS, [("Search settings", None), ("Network & internet", "network"), ("Connected devices", "connected_devices"),
+                            ("Apps", "apps"), ("Notifications", "notifications"), ("Battery", "battery"),
+                            ("Display", "display"), ("Sound & vibration", "sound")]),
+    "network": (SETTINGS, [("Navigate up", "settings"), ("Internet", "internet"), ("SIMs", "sims"), ("Airplane mode", None),
+                           ("Hotspot & tethering", "hotspot"), ("Data Saver", "data_saver")]),
+    "quick_settings": (SYSTEMUI, [("Internet", None), ("Bluetooth", None), ("Do Not Disturb", None), ("Flashlight", None)]),
+    "quick_settings_expanded": (SYSTEMUI, [("Internet", None), ("Bluetooth", None), ("Do Not Disturb", None), ("Flashlight", None),
+                                           ("Airplane mode", None), ("Auto-rotate", None), ("Settings", "settings")]),
+    "dialer": _leaf("com.google.android.dialer", "Keypad", "home"),
+    "messages": _leaf("com.google.android.apps.messaging", "Start chat", "home"),
+    "chrome": _leaf("com.android.chrome", "Search or type web address", "home"),
+    "calendar": _leaf("com.google.android.calendar", "Create new event", "app_drawer"),
+    "camera": _leaf("com.android.camera2", "Shutter", "app_drawer"),
+    "youtube": _leaf("com.google.android.youtube", "Search", "app_drawer"),
+    "connected_devices": _leaf(SETTINGS, "Pair new device", "settings"),
+    "apps": _leaf(SETTINGS, "See all apps", "settings"),
+    "notifications": _leaf(SETTINGS, "App notifications", "settings"),
+    "battery": _leaf(SETTINGS, "Battery Saver", "settings"),
+    "display": _leaf(SETTINGS, "Dark theme", "settings"),
+    "sound": _leaf(SETTINGS, "Media volume", "settings"),
+    "internet": _leaf(SETTINGS, "Wi-Fi", "network"),
+    "sims": _leaf(SETTINGS, "Mobile data", "network"),
+    "hotspot": _leaf(SETTINGS, "Wi-Fi hotspot", "network"),
+    "data_saver": _leaf(SETTINGS, "Use Data Saver", "network"),
+}
+
+
+def _element_bounds(index):
+    return 0, 200 + index * 120, 1080, 320 + index * 120
+
+
+def _render_screen(screen):
+    """
+    Renders a screen as a uiautomator dump.
+
+    Returns:
+        xml_data (bytes): The XML hierarchy of the screen.
+    """
+    package, elements = SCREENS[screen]
+    nodes = []
+    if package == SYSTEMUI:
+        # The clock of the status bar is clickable, but filtered by the environment
+        nodes.append('<node index="0" text="12:00" resource-id="com.android.systemui:id/clock" class="android.widget.TextView" '
+                     'package="{0}" content-desc="" clickable="true" bounds="[0,0][120,60]" />'.format(package))
+    for index, (text, _) in enumerate(elements):
+        nodes.append('<node index="{0}" text={1} resource-id="{2}:id/item_{0}" class="android.widget.TextView" package="{2}" '
+                     'content-desc="" clickable="true" bounds="[{3},{4}][{5},{6}]" />'
+                     .format(index, quoteattr(text), package, *_element_bounds(index)))
+    return ('<?xml version=\'1.0\' encoding=\'UTF-8\' standalone=\'yes\' ?><hierarchy rotation="0">'
+            '<node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="{0}" content-desc="" '
+            'clickable="false" bounds="[0,0][1080,1920]">{1}</node></hierarchy>'.format(package, "".join(nodes))).encode("utf-8")
+
+
+class SimulatedAndroidEnv(AndroidEnv):
+    """Deterministic backend of `AndroidEnv` for benchmarks, which replaces the emulator with a fixed graph of screens.
+    The adb commands of the environment are interpreted by the simulation and the dumps are written to the same
+    files as for an emulator, so the whole observation and reward pipeline runs unchanged, just without waiting.
+    Currently, the screens cover the airplane task.
+    """
+
+    def __init__(self, emulator_id="simulator-0", **kwargs):
+        """
+        Initializes the simulation and the environment, see `AndroidEnv` for the arguments.
+        """
+        self.screen = "home"
+        self.rendered_screens = {}
+        self.adb_commands = 0
+        super().__init__(emulator_id=emulator_id, **kwargs)
+
+    def _adb(self, command):
+        """
+        Simulate an adb command: key events, taps and swipes change the current screen and pulls write its dump.
+        All other commands (e.g. resetting the settings) have no visible effect in the simulation.
+        """
+        self.adb_commands += 1
+        args = command.split()
+        if args[:4] == ["shell", "input", "keyevent", "KEYCODE_HOME"]:
+            self.screen = "home"
+        elif args[:3] == ["shell", "input", "tap"]:
+            self._tap(int(args[3]), int(args[4]))
+        elif args[:3] == ["shell", "input", "swipe"]:
+            self._swipe(int(args[4]), int(args[6]))
+        elif args[0] == "pull":
+            if self.screen not in self.rendered_screens:
+                self.rendered_screens[self.screen] = _render_screen(self.screen)
+            with open(args[2], "wb") as f:
+                f.write(self.rendered_screens[self.screen])
+
+    def _wait(self, seconds):
+        pass
+
+    def _tap(self, x, y):
+        for index, (_, target) in enumerate(SCREENS[self.screen][1]):
+            left, top, right, bottom = _element_bounds(index)
+            if left <= x <= right and top <= y <= bottom:
+                if target is not None:
+                    self.screen = target
+                return
+
+    def _swipe(self, start_y, end_y):
+        if start_y == 0 and end_y > start_y:    # swipe from top
+            self.screen = "quick_settings_expanded" if SCREENS[self.screen][0] == SYSTEMUI else "quick_settings"
+        elif end_y < start_y:                   # swipe up
+            self.screen = "app_drawer" if self.screen == "home" else "home"
@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import gymnasium as gym
+from environment.android_env import AndroidEnv
+from environment.ui_vocabulary import UIVocabulary
+
+
+class HotStandbyAndroidEnv(gym.Env):
+    """Pairs two emulators for one logical environment: while the active emulator runs the episode, the standby
+    emulator is reset and its initial observation captured in the background. At the end of the episode the two
+    swap roles, so the learner doesn't wait for the reset of the emulator (HOME, task reset, dump and 2 s sleep).
+    Each emulator is driven by its own `AndroidEnv` (own adb commands, dump file and task state), only the UI
+    vocabulary is shared, so both observe the same IDs.
+    """
+
+    def __init__(self, emulator_ids=("emulator-5554", "emulator-5556"), vocabulary_path=None, env_class=AndroidEnv, **kwargs):
+        """
+        Initializes the environments of both emulators.
+
+        Args:
+            emulator_ids (tuple):   The IDs of the active and the standby emulator.
+                                    Defaults to ("emulator-5554", "emulator-5556").
+            vocabulary_path (str):  Directory of a persistent UI vocabulary, see `AndroidEnv`. Defaults to None.
+            env_class (type):       The environment of a single emulator, e.g. `SimulatedAndroidEnv`.
+                                    Defaults to `AndroidEnv`.
+            **kwargs:               Further arguments of the environments (task, exploration_mode, ...).
+        """
+        if len(emulator_ids) != 2 or emulator_ids[0] == emulator_ids[1]:
+            raise ValueError("Two different emulators are required, got {0}".format(emulator_ids))
+
+        self.ui_vocabulary = UIVocabulary(vocabulary_path)
+        self.active, self.standby = (env_class(emulator_id=emulator_id, ui_vocabulary=self.ui_vocabulary, **kwargs)
+                                     for emulator_id in emulator_ids)
+        self.action_space = self.active.action_space
+        self.observation_space = self.active.observation_space
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_reset = None   # Future of the standby reset
+        self.reset_counts = {"resets": 0, "total_latency_s": 0.0, "last_latency_s": 0.0, "standby_resets": 0, "standby_reset_s": 0.0}
+
+    def reset(self, seed=None, options=None):
+        """
+        Switch to the standby emulator, which was reset in the background, and start resetting the previous one.
+        The first reset resets the active emulator directly.
+
+        Returns:
+            Tuple[dict, dict]: Initial observation and additional info, including the effective reset latency
+                               "reset_latency" (in seconds).
+        """
+        start = time.perf_counter()
+        if self.pending_reset is None:
+            obs, info = self.active.reset(seed=seed, options=options)
+        else:
+            obs, info = self.pending_reset.result()
+            self.active, self.standby = self.standby, self.active
+        latency = time.perf_counter() - start
+        self.pending_reset = self.executor.submit(self._reset_standby, options)
+
+        self.reset_counts["resets"] += 1
+        self.reset_counts["total_latency_s"] += latency
+        self.reset_counts["last_latency_s"] = latency
+        info = dict(info, reset_latency=latency, emulator_id=self.active.emulator_id)
+        return obs, info
+
+    def step(self, action):
+        """
+        Perform a step on the active emulator, see `AndroidEnv.step`.
+        """
+        return self.active.step(action)
+
+    def close(self):
+        """
+        Wait for the standby reset and close both environments and the UI vocabulary.
+        """
+        if self.pending_reset is not None:
+            self.pending_reset.exception()
+        self.executor.shutdown()
+        self.active.close()
+        self.standby.close()
+        self.ui_vocabulary.close()
+
+    def reset_latency_stats(self):
+        """
+        Returns the reset latencies as seen by the learner.
+
+        Returns:
+            stats (dict): Number of resets, the total, mean and last effective reset latency and the mean duration
+                          of the background resets (all in seconds).
+        """
+        stats = dict(self.reset_counts)
+        stats["mean_latency_s"] = stats["total_latency_s"] / stats["resets"] if stats["resets"] else 0.0
+        stats["mean_standby_reset_s"] = stats["standby_reset_s"] / stats["standby_resets"] if stats["standby_resets"] else 0.0
+        return stats
+
+    def _reset_standby(self, options):
+        start = time.perf_counter()
+        obs, info = self.standby.reset(options=options)
+        self.reset_counts["standby_resets"] += 1
+        self.reset_counts["standby_reset_s"] += time.perf_counter() - start
+        return obs, info
@@ -0,0 +1,152 @@
+import json
+import os
+
+
+TASKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tasks")
+
+
+def load_task_spec(task):
+    """
+    Loads the specification of a task.
+
+    A specification is a JSON file with the following fields:
+        token (str):                    The token the agent types into text fields.
+        gestures (list):                The additional gestures enabled for the task, e.g. "swipe up".
+        additional_ui_options (int):    Extra actions added to the action space for the gestures.
+        reset (list):                   adb commands (without "adb -s <emulator_id>") resetting the task.
+        milestones (list):              Intermediate steps rewarded in the guided exploration modes. Each milestone
+                                        has a "name", "steps_to_goal" (the milestone is rewarded with the finish
+                                        reward divided by it), a list of "match" entries with an "action_text" and
+                                        an optional "package", the optional predicates "previous_action" and
+                                        "max_ui_options" and an optional "message". If several milestones match,
+                                        the first one in the list is evaluated.
+        goals (list):                   Actions finishing the episode, with an "action_text" or "contains_token"
+                                        and an optional "package".
+
+    Args:
+        task (str): The name of a task in `environment/tasks` or the path to a specification file.
+
+    Returns:
+        spec (dict): The specification of the task.
+    """
+    path = task if task.endswith(".json") else os.path.join(TASKS_DIR, "{0}.json".format(task))
+    if not os.path.exists(path):
+        raise ValueError("Unknown task: {0}".format(task))
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CompiledTask:
+    """
+    Task compiled from a specification. The milestones and goals are compiled into hash tables keyed by
+    (package, action_text), so evaluating the reward costs the same regardless of the number of rules,
+    and the given milestone rewards are tracked in a bitset.
+    """
+
+    def __init__(self, spec, emulator_id, exploration_mode="full_exploration", episode_timesteps=100, adb=None):
+        """
+        Compiles the specification.
+
+        Args:
+            spec (dict):                The specification of the task, see `load_task_spec`.
+            emulator_id (str):          The ID of the emulator.
+            exploration_mode (str):     Exploration mode of the agent, also affecting the reward structure.
+                                        Possible modes: "guided_restricted", "guided_open", "full_exploration".
+                                        Defaults to "full_exploration"
+            episode_timesteps (int):    The maximum number of steps performed per episode. Defaults to 100.
+            adb (callable):             Executes an adb command on the emulator. Defaults to None, which runs
+                                        the commands with `os.system`.
+        """
+        self.name = spec.get("name", "")
+        self.emulator_id = emulator_id
+        self.token = spec["token"]
+        self.exploration_mode = exploration_mode
+        self.episode_timesteps = episode_timesteps
+        self.reset_commands = list(spec.get("reset", []))
+        self.adb = adb if adb is not None else (lambda command: os.system("adb -s {0} {1}".format(emulator_id, command)))
+        self.finish_reward = self.episode_timesteps / 2
+        self.given_rewards = 0  # Bitset of the milestones rewarded in the current episode
+
+        # Milestones: (package, action_text) -> rules in the order of the specification,
+        # the key (None, action_text) holds the rules matching any package
+        self.milestones = {}
+        rules = []
+        for bit, milestone in enumerate(spec.get("milestones", [])):
+            rule = (
+                1 << bit,
+                self.finish_reward / milestone["steps_to_goal"],
+                milestone.get("previous_action"),
+                milestone.get("max_ui_options"),
+                milestone.get("message"),
+            )
+            for match in milestone["match"]:
+                rules.append((match.get("package"), match["action_text"], len(rules), rule))
+
+        for package, action_text, _, _ in rules:
+            if (package, action_text) not in self.milestones:
+                self.milestones[(package, action_text)] = [
+                    rule for rule_package, rule_action_text, _, rule in rules
+                    if rule_action_text == action_text and rule_package in (package, None)
+                ]
+
+        # Goals: hashed (package, action_text) keys and token goals, which need a substring check
+        self.goals = set()
+        self.token_goals = []
+        for goal in spec.get("goals", []):
+            if goal.get("contains_token"):
+                self.token_goals.append(goal.get("package"))
+            else:
+                self.goals.add((goal.get("package"), goal["action_text"]))
+
+    def reset_task(self):
+        """
+        Resets the task to its initial state by running the reset commands of the specification.
+        """
+        self.given_rewards = 0
+        for command in self.reset_commands:
+            self.adb(command)
+
+    def get_reward(self, obs_history, ui_options_current):
+        """
+        Evaluates the reward based on the action text.
+
+        Args:
+            obs_history (list): Previous observation history.
+            ui_options_current (list): UI options of the current screen.
+
+        Returns:
+            Tuple[int, bool]: reward, done
+        """
+        reward = 0
+        done = False
+        package = obs_history[-1]['package']
+        action_text = obs_history[-1]['action_text']
+
+        if self.exploration_mode == "guided_restricted" or self.exploration_mode == "guided_open":
+            rules = self.milestones.get((package, action_text)) or self.milestones.get((None, action_text), ())
+            for bit, milestone_reward, previous_action, max_ui_options, message in rules:
+                if previous_action is not None:
+                    if (obs_history[-2]['action_text'] if len(obs_history) > 1 else "") != previous_action:
+                        continue
+                if max_ui_options is not None and len(ui_options_current) > max_ui_options:
+                    continue
+
+                if not self.given_rewards & bit:
+                    reward = milestone_reward
+                    self.given_rewards |= bit
+                else:
+                    reward = 1
+                if message:
+                    print(message)
+                break
+
+        reward -= 1
+
+        if (package, action_text) in self.goals or (None, action_text) in self.goals or any(
+                goal_package in (package, None) and self.token in action_text and action_text != self.token
+                for goal_package in self.token_goals):
+            reward = self.finish_reward
+            print("Yay FINISHED!!")
+            done = True
+
+        return reward, done
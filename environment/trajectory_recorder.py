@@ -0,0 +1,129 @@
+import glob
+import json
+import os
+import time
+import uuid
+import gymnasium as gym
+import numpy as np
+
+
+def _copy_obs(obs):
+    # AndroidEnv updates the arrays of its observation in place, so every recorded observation is copied
+    if isinstance(obs, dict):
+        return {key: np.array(value, copy=True) for key, value in obs.items()}
+    return np.array(obs, copy=True)
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every transition of the wrapped environment, so that the expensive emulator steps can be reused
+    across runs. The transitions are buffered in columns and written as compressed chunks of `chunk_size` steps,
+    which keeps appending O(1) and the memory bounded. Rollback steps of speculative observations (see `AndroidEnv`)
+    aren't real transitions and are not recorded.
+    """
+
+    def __init__(self, env, directory, chunk_size=1000):
+        """
+        Initializes the recorder.
+
+        Args:
+            env (gym.Env):      The environment to record.
+            directory (str):    Directory to store the chunks. Several recorders can share a directory.
+            chunk_size (int):   The number of transitions per chunk. Defaults to 1000.
+        """
+        super().__init__(env)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        # Unique per recorder, so recorders sharing the directory never overwrite each other's chunks
+        self.prefix = "{0}_{1}_{2}".format(time.strftime("%Y%m%d_%H%M%S"), os.getpid(), uuid.uuid4().hex[:12])
+        self.chunk_index = 0
+        self.last_obs = None
+        self._clear()
+
+    def reset(self, *, seed=None, options=None):
+        obs, info = self.env.reset(seed=seed, options=options)
+        self.last_obs = _copy_obs(obs)
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        next_obs = _copy_obs(obs)
+        if info.get("speculation_rollback"):
+            self.last_obs = next_obs
+            return obs, reward, terminated, truncated, info
+
+        self.columns["obs"].append(self.last_obs)
+        self.columns["next_obs"].append(next_obs)
+        self.columns["action"].append(int(action))
+        self.columns["reward"].append(float(reward))
+        self.columns["terminated"].append(bool(terminated))
+        self.columns["truncated"].append(bool(truncated))
+        self.columns["info"].append(json.dumps(info, default=str))
+        self.last_obs = next_obs
+
+        if len(self.columns["action"]) >= self.chunk_size:
+            self.flush()
+
+        return obs, reward, terminated, truncated, info
+
+    def flush(self):
+        """
+        Writes the buffered transitions as a new chunk.
+        """
+        if not self.columns["action"]:
+            return
+
+        arrays = {
+            "action": np.array(self.columns["action"], dtype=np.int64),
+            "reward": np.array(self.columns["reward"], dtype=np.float32),
+            "terminated": np.array(self.columns["terminated"], dtype=bool),
+            "truncated": np.array(self.columns["truncated"], dtype=bool),
+            "info": np.array(self.columns["info"]),
+        }
+        for column in ("obs", "next_obs"):
+            if isinstance(self.columns[column][0], dict):
+                for key in self.columns[column][0]:
+                    arrays["{0}.{1}".format(column, key)] = np.stack([obs[key] for obs in self.columns[column]])
+            else:
+                arrays[column] = np.stack(self.columns[column])
+
+        # Write to a temporary file first, so that loaders never see incomplete chunks
+        path = os.path.join(self.directory, "{0}_{1:06d}.npz".format(self.prefix, self.chunk_index))
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + ".tmp", path)
+        self.chunk_index += 1
+        self._clear()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def _clear(self):
+        self.columns = {column: [] for column in ("obs", "next_obs", "action", "reward", "terminated", "truncated", "info")}
+
+
+def load_trajectories(directory):
+    """
+    Loads the chunks written by `TrajectoryRecorder`.
+
+    Args:
+        directory (str): Directory containing the chunks.
+
+    Returns:
+        Generator[dict]: One dictionary per chunk with the columns "obs", "next_obs", "action", "reward",
+                         "terminated", "truncated" and "info". Dictionary observations are returned as
+                         dictionaries of arrays.
+    """
+    for path in sorted(glob.glob(os.path.join(directory, "*.npz"))):
+        with np.load(path, allow_pickle=False) as data:
+            chunk = {"obs": {}, "next_obs": {}}
+            for name in data.files:
+                column, _, key = name.partition(".")
+                if key:
+                    chunk[column][key] = data[name]
+                else:
+                    chunk[column] = data[name]
+        chunk["info"] = [json.loads(info) for info in chunk["info"]]
+        yield chunk
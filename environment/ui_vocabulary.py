@@ -0,0 +1,210 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+
+_INDEX_MAGIC = b"UIVOCAB1"
+_INDEX_HEADER = struct.Struct("<8sII")     # magic, number of slots, number of entries
+_INDEX_SLOT = struct.Struct("<QQI4x")      # hash, record offset, id
+_RECORD_HEADER = struct.Struct("<III")     # id, text length, package length
+
+
+class UIVocabulary:
+    """
+    Stable mapping of UI elements, identified by their text and package, to the IDs used in the observations.
+
+    Without a path the vocabulary only lives in memory. With a path it is stored in a directory shared by all runs
+    and workers: `entries.dat` is an append-only file of the elements and `index.bin` is a memory-mapped hash table
+    pointing into it. Lookups read the mapped index without locking, new elements are appended under an exclusive
+    file lock, so concurrent processes never assign different IDs to the same element.
+    """
+
+    def __init__(self, path=None, capacity=24999):
+        """
+        Initializes the vocabulary.
+
+        Args:
+            path (str):         Directory of the persistent vocabulary, it is created if it doesn't exist.
+                                Defaults to None, which keeps the vocabulary in memory only.
+            capacity (int):     The maximum number of elements (IDs range from 1 to capacity). Defaults to 24999.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.ids = {}   # In-memory vocabulary or cache of the persistent one
+
+        if path is None:
+            return
+
+        os.makedirs(path, exist_ok=True)
+        self.data_fd = os.open(os.path.join(path, "entries.dat"), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        index_fd = os.open(os.path.join(path, "index.bin"), os.O_RDWR | os.O_CREAT, 0o644)
+
+        slots = 1
+        while slots < 2 * capacity:
+            slots *= 2
+        index_size = _INDEX_HEADER.size + slots * _INDEX_SLOT.size
+
+        # Create the index only once, even if several workers start at the same time
+        fcntl.flock(self.data_fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(index_fd).st_size == 0:
+                os.ftruncate(index_fd, index_size)
+                os.pwrite(index_fd, _INDEX_HEADER.pack(_INDEX_MAGIC, slots, 0), 0)
+            self.index = mmap.mmap(index_fd, 0)
+        finally:
+            fcntl.flock(self.data_fd, fcntl.LOCK_UN)
+            os.close(index_fd)
+
+        magic, self.slots, _ = _INDEX_HEADER.unpack_from(self.index, 0)
+        if magic != _INDEX_MAGIC:
+            raise ValueError("Not a UI vocabulary index: {0}".format(path))
+        if self.slots < 2 * capacity:
+            raise ValueError("The vocabulary in {0} was created with a smaller capacity".format(path))
+
+    def __len__(self):
+        if self.path is None:
+            return len(self.ids)
+        return _INDEX_HEADER.unpack_from(self.index, 0)[2]
+
+    def get(self, text, package):
+        """
+        Looks up the ID of a UI element.
+
+        Args:
+            text (str):     The name of the UI element.
+            package (str):  The (shortened) package the UI element belongs to.
+
+        Returns:
+            id (int): The ID of the element or None if it is not part of the vocabulary.
+        """
+        key = (text, package)
+        element_id = self.ids.get(key)
+        if element_id is None and self.path is not None:
+            element_id = self._find(key, self._hash(key))[0]
+            if element_id is not None:
+                self.ids[key] = element_id
+        return element_id
+
+    def add(self, text, package):
+        """
+        Returns the ID of a UI element and adds the element to the vocabulary if it is unknown.
+
+        Args:
+            text (str):     The name of the UI element.
+            package (str):  The (shortened) package the UI element belongs to.
+
+        Returns:
+            id (int): The ID of the element.
+        """
+        element_id = self.get(text, package)
+        if element_id is not None:
+            return element_id
+
+        key = (text, package)
+        with self.lock:
+            if self.path is None:
+                return self._add_in_memory(key)
+
+            fcntl.flock(self.data_fd, fcntl.LOCK_EX)
+            try:
+                return self._append(key)
+            finally:
+                fcntl.flock(self.data_fd, fcntl.LOCK_UN)
+
+    def entries(self):
+        """
+        Returns all elements of the vocabulary.
+
+        Returns:
+            entries (list): (id, text, package) tuples sorted by ID.
+        """
+        if self.path is None:
+            return sorted((element_id, text, package) for (text, package), element_id in self.ids.items())
+
+        entries = []
+        for slot in range(self.slots):
+            slot_hash, offset, _ = _INDEX_SLOT.unpack_from(self.index, _INDEX_HEADER.size + slot * _INDEX_SLOT.size)
+            if slot_hash != 0:
+                entries.append(self._read_record(offset))
+        return sorted(entries)
+
+    def restore(self, entries):
+        """
+        Adds the elements of another vocabulary, e.g. from a checkpoint, while keeping their IDs.
+
+        Args:
+            entries (list): (id, text, package) tuples sorted by ID, as returned by `entries`.
+        """
+        for element_id, text, package in entries:
+            if self.add(text, package) != element_id:
+                raise ValueError("The vocabulary conflicts with the restored one at '{0}' ({1})".format(text, package))
+
+    def close(self):
+        if self.path is not None:
+            self.index.close()
+            os.close(self.data_fd)
+
+    def _add_in_memory(self, key):
+        element_id = self.ids.get(key)
+        if element_id is None:
+            if len(self.ids) >= self.capacity:
+                raise ValueError("The UI vocabulary is full ({0} elements)".format(self.capacity))
+            element_id = len(self.ids) + 1
+            self.ids[key] = element_id
+        return element_id
+
+    def _append(self, key):
+        """
+        Appends an element to the persistent vocabulary. Must be called while holding the file lock.
+        """
+        key_hash = self._hash(key)
+        element_id, slot = self._find(key, key_hash)   # Another process may have added it in the meantime
+        if element_id is None:
+            count = len(self)
+            if count >= self.capacity:
+                raise ValueError("The UI vocabulary is full ({0} elements)".format(self.capacity))
+            element_id = count + 1
+
+            text, package = key[0].encode("utf-8"), key[1].encode("utf-8")
+            offset = os.fstat(self.data_fd).st_size
+            os.write(self.data_fd, _RECORD_HEADER.pack(element_id, len(text), len(package)) + text + package)
+
+            # Publish the slot by writing its hash last, lock-free readers skip slots without a hash
+            position = _INDEX_HEADER.size + slot * _INDEX_SLOT.size
+            struct.pack_into("<QI", self.index, position + 8, offset, element_id)
+            struct.pack_into("<Q", self.index, position, key_hash)
+            struct.pack_into("<I", self.index, 12, element_id)
+
+        self.ids[key] = element_id
+        return element_id
+
+    def _find(self, key, key_hash):
+        """
+        Probes the memory-mapped index for an element.
+
+        Returns:
+            Tuple[int, int]: The ID of the element (None if missing) and the probed slot.
+        """
+        mask = self.slots - 1
+        slot = key_hash & mask
+        while True:
+            slot_hash, offset, element_id = _INDEX_SLOT.unpack_from(self.index, _INDEX_HEADER.size + slot * _INDEX_SLOT.size)
+            if slot_hash == 0:
+                return None, slot
+            if slot_hash == key_hash and self._read_record(offset)[1:] == key:
+                return element_id, slot
+            slot = (slot + 1) & mask
+
+    def _read_record(self, offset):
+        element_id, text_length, package_length = _RECORD_HEADER.unpack(os.pread(self.data_fd, _RECORD_HEADER.size, offset))
+        data = os.pread(self.data_fd, text_length + package_length, offset + _RECORD_HEADER.size)
+        return element_id, data[:text_length].decode("utf-8"), data[text_length:].decode("utf-8")
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b("{0}\0{1}".format(*key).encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1    # 0 marks an empty slot
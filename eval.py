@@ -1,8 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime
-import pandas as pd
-from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
+from stable_baselines3.common.callbacks import BaseCallback
 import os
 
 
@@ -142,10 +140,38 @@ class MetricsCallback(BaseCallback):
 
         return True
 
+    def get_state(self):
+        """
+        Return the collected metrics, e.g. to store them in a checkpoint.
+
+        Returns:
+            state (dict): The metrics and counters of the callback.
+        """
+        return {
+            'metrics': self.metrics,
+            'all_episode_rewards': self.all_episode_rewards,
+            'all_episode_lengths': self.all_episode_lengths,
+            'successful_episodes': self.successful_episodes,
+            'total_episodes': self.total_episodes,
+            'best_mean_reward': self.best_mean_reward,
+        }
+
+    def set_state(self, state):
+        """
+        Restore the metrics returned by `get_state`, e.g. when resuming the training from a checkpoint.
+
+        Args:
+            state (dict): The metrics and counters of the callback.
+        """
+        for key, value in state.items():
+            setattr(self, key, value)
+
     def save_metrics(self):
         """
         Save collected metrics to a CSV file.
         """
+        import pandas as pd    # Imported lazily, only needed when the metrics are written
+
         metrics_df = pd.DataFrame()
 
         # Add all collected metrics to dataframe
@@ -166,6 +192,8 @@ class MetricsCallback(BaseCallback):
         """
         Generate and save plots for the collected training metrics.
         """
+        import matplotlib.pyplot as plt    # Imported lazily, pyplot is the most expensive import by far
+
         plt.figure(figsize=(15, 15))  # Made taller for more plots
 
         # Plot rewards
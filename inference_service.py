@@ -0,0 +1,193 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from stable_baselines3 import DQN
+
+
+class InferenceService:
+    """
+    Batched policy inference shared by many environments. The model is loaded once, the observations of all
+    environments are collected into micro-batches (up to `max_batch_size` observations or until `max_delay`
+    has passed since the first observation of the batch) and answered with a single forward pass.
+    The model can be swapped for a newer checkpoint at any time without restarting the environments.
+    """
+
+    def __init__(self, model_path, max_batch_size=32, max_delay=0.005, deterministic=True, device="auto", poll_interval=None):
+        """
+        Loads the model and starts the inference thread.
+
+        Args:
+            model_path (str):       Path to the saved model, e.g. "<log_dir>/<task>.zip".
+            max_batch_size (int):   The maximum number of observations per forward pass. Defaults to 32.
+            max_delay (float):      The maximum time (in seconds) an observation waits for a batch to fill up.
+                                    Defaults to 0.005.
+            deterministic (bool):   Whether to return deterministic actions. Defaults to True.
+            device (str):           Device of the model. Defaults to "auto".
+            poll_interval (float):  Interval (in seconds) to check `model_path` for a newer checkpoint, which is then
+                                    loaded automatically. Defaults to None, which disables the check.
+        """
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.deterministic = deterministic
+        self.device = device
+        self.model = DQN.load(model_path, device=device)
+        self.model_mtime = os.path.getmtime(model_path)
+        self.requests = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+        self._closed = threading.Event()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        if poll_interval is not None:
+            threading.Thread(target=self._watch, args=(poll_interval,), daemon=True).start()
+
+    def submit(self, obs):
+        """
+        Queues an observation for the next batch.
+
+        Args:
+            obs (dict | np.ndarray): The observation of a single environment.
+
+        Returns:
+            future (Future): Future resolving to the action.
+        """
+        future = Future()
+        self.requests.put((obs, future, time.perf_counter()))
+        return future
+
+    def predict(self, obs):
+        """
+        Returns the action for the observation of a single environment, blocking until its batch is processed.
+        """
+        return self.submit(obs).result()
+
+    def reload(self, model_path=None):
+        """
+        Loads a newer checkpoint and swaps it in. Batches in progress finish with the previous model.
+
+        Args:
+            model_path (str): Path to the new model. Defaults to None, which reloads `model_path`.
+        """
+        if model_path is not None:
+            self.model_path = model_path
+        mtime = os.path.getmtime(self.model_path)
+        model = DQN.load(self.model_path, device=self.device)
+        self.model, self.model_mtime = model, mtime
+        with self.stats_lock:
+            self.stats["reloads"] += 1
+        print(f"Inference service switched to model {self.model_path}")
+
+    def get_stats(self):
+        """
+        Returns the statistics of the service.
+
+        Returns:
+            stats (dict): Number of requests, batches and reloads, the mean batch size, the batch size histogram
+                          and the latency percentiles (in milliseconds) of the recent requests.
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+            stats["batch_sizes"] = dict(self.stats["batch_sizes"])
+            latencies = np.array(self.latencies) * 1000
+
+        stats["mean_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        if len(latencies) > 0:
+            stats["latency_p50_ms"], stats["latency_p95_ms"], stats["latency_p99_ms"] = np.percentile(latencies, [50, 95, 99])
+        return stats
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"requests": 0, "batches": 0, "reloads": 0, "batch_sizes": {}}
+            self.latencies = deque(maxlen=10000)
+
+    def close(self):
+        self._closed.set()
+        self.thread.join()
+
+    def _serve(self):
+        while not self._closed.is_set():
+            try:
+                batch = [self.requests.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            # Collect observations until the batch is full or the deadline of its first observation has passed
+            deadline = batch[0][2] + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                actions = self._forward([obs for obs, _, _ in batch])
+            except Exception as error:
+                for _, future, _ in batch:
+                    future.set_exception(error)
+                continue
+
+            now = time.perf_counter()
+            for (_, future, submitted), action in zip(batch, actions):
+                future.set_result(int(action))
+
+            with self.stats_lock:
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["batch_sizes"][len(batch)] = self.stats["batch_sizes"].get(len(batch), 0) + 1
+                self.latencies.extend(now - submitted for _, _, submitted in batch)
+
+    def _forward(self, observations):
+        if isinstance(observations[0], dict):
+            batch = {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+        else:
+            batch = np.stack(observations)
+        actions, _ = self.model.predict(batch, deterministic=self.deterministic)
+        return actions
+
+    def _watch(self, poll_interval):
+        while not self._closed.wait(poll_interval):
+            try:
+                if os.path.getmtime(self.model_path) > self.model_mtime:
+                    self.reload()
+            except (OSError, ValueError) as error:
+                print(f"Failed to reload {self.model_path}: {error}")
+
+
+def run_episodes(service, envs, total_timesteps=1000):
+    """
+    Steps several environments in parallel with the actions of a shared inference service.
+
+    Args:
+        service (InferenceService): The inference service.
+        envs (list): The environments, e.g. one per emulator.
+        total_timesteps (int): Number of timesteps per environment. Default is 1000.
+
+    Returns:
+        episode_rewards (list): The rewards of the finished episodes of each environment.
+    """
+    episode_rewards = [[] for _ in envs]
+
+    def run(index, env):
+        obs, _ = env.reset()
+        episode_reward = 0
+        for _ in range(total_timesteps):
+            obs, reward, terminated, truncated, _ = env.step(service.predict(obs))
+            episode_reward += reward
+            if terminated or truncated:
+                episode_rewards[index].append(episode_reward)
+                episode_reward = 0
+                obs, _ = env.reset()
+
+    threads = [threading.Thread(target=run, args=(index, env)) for index, env in enumerate(envs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return episode_rewards
@@ -1,11 +1,28 @@
+import argparse
+import os
 import gymnasium as gym
 from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import CallbackList
 from stable_baselines3.common.monitor import Monitor
 import environment
+from checkpoint import BackgroundCheckpointCallback, restore_checkpoint
+from environment.trajectory_recorder import TrajectoryRecorder
 from eval import MetricsCallback, create_log_dir
+from offline import prefill_replay_buffer, pretrain_offline
 
 
-def train(env, task, total_timesteps=1000, episode_timesteps=100):
+# Default hyperparameters of the DQN, can be overridden per training (e.g. by sweep.py)
+DQN_KWARGS = {
+    "learning_rate": 0.001,
+    "gamma": 0.99,
+    "exploration_fraction": 0.5,
+    "seed": 42,
+}
+
+
+def train(env, task, total_timesteps=1000, episode_timesteps=100, recordings_dir=None, pretrain_steps=0,
+          checkpoint_freq=500, save_replay_buffer=True, resume_from=None, dqn_kwargs=None, log_dir=None,
+          metrics_callback=None, callbacks=None):
     """Train a reinforcement learning model using DQN.
 
     Args:
@@ -13,24 +30,65 @@ def train(env, task, total_timesteps=1000, episode_timesteps=100):
         task (str): A string identifier for the training task.
         total_timesteps (int): Total number of timesteps for training. Default is 1000.
         episode_timesteps (int): Number of timesteps per episode for evaluation. Default is 100.
+        recordings_dir (str): Directory of recorded trajectories. Previous recordings prefill the replay buffer
+            and the new transitions are recorded into it. Default is None.
+        pretrain_steps (int): Number of offline gradient steps on the prefilled replay buffer. Default is 0.
+        checkpoint_freq (int): Frequency (in timesteps) of the background checkpoints, None disables the checkpoints.
+            Default is 500.
+        save_replay_buffer (bool): Whether the checkpoints contain the replay buffer, which allows to resume the
+            training with the previous experience. Default is True.
+        resume_from (str): Checkpoint to resume the training from, which continues in the log directory
+            of the checkpoint. Default is None.
+        dqn_kwargs (dict): Hyperparameters overriding `DQN_KWARGS`. Default is None.
+        log_dir (str): Log directory. Default is None, which creates a timestamped directory for the task.
+        metrics_callback (MetricsCallback): Metrics callback to use, e.g. to inspect the metrics afterwards.
+            Default is None, which creates one in the log directory.
+        callbacks (list): Additional callbacks. Default is None.
 
     Returns:
         tuple: A tuple containing the trained model and the log directory path.
     """
-    # Create log directory
-    log_dir = create_log_dir(task)
+    # Create log directory, or continue in the one of the resumed training (<log_dir>/checkpoints/step_<n>)
+    if resume_from is not None:
+        log_dir = os.path.dirname(os.path.dirname(os.path.normpath(resume_from)))
+    elif log_dir is None:
+        log_dir = create_log_dir(task)
+    os.makedirs(log_dir, exist_ok=True)   # Monitor writes into an existing directory only
 
-    # Wrap the environment with Monitor
-    env = Monitor(env, log_dir)
+    # Record the transitions of this run
+    if recordings_dir is not None:
+        env = TrajectoryRecorder(env, recordings_dir)
 
-    # Create the model
-    model = DQN("MultiInputPolicy", env=env, verbose=1, learning_rate=0.001, gamma=0.99, exploration_fraction=0.5, seed=42, tensorboard_log=log_dir)
+    # Wrap the environment with Monitor, a resumed training appends to the monitor file
+    env = Monitor(env, log_dir, override_existing=resume_from is None)
 
     # Create a metrics callback
-    metrics_callback = MetricsCallback(log_dir=log_dir, eval_freq=episode_timesteps, success_threshold=episode_timesteps/2.0)
-
-    # Train the model with the callback
-    model.learn(total_timesteps=total_timesteps, callback=metrics_callback)
+    if metrics_callback is None:
+        metrics_callback = MetricsCallback(log_dir=log_dir, eval_freq=episode_timesteps, success_threshold=episode_timesteps/2.0)
+
+    if resume_from is not None:
+        # Restore the model, replay buffer, metrics and UI vocabulary
+        model = restore_checkpoint(resume_from, env, metrics_callback=metrics_callback, tensorboard_log=log_dir)
+    else:
+        # Create the model
+        model = DQN("MultiInputPolicy", env=env, verbose=1, tensorboard_log=log_dir, **{**DQN_KWARGS, **(dqn_kwargs or {})})
+
+        # Reuse the experience of previous runs
+        if recordings_dir is not None and prefill_replay_buffer(model, recordings_dir) > 0 and pretrain_steps > 0:
+            pretrain_offline(model, pretrain_steps)
+
+    # Create a callback writing checkpoints in the background
+    training_callbacks = [metrics_callback]
+    if checkpoint_freq is not None:
+        training_callbacks.append(BackgroundCheckpointCallback(os.path.join(log_dir, "checkpoints"), save_freq=checkpoint_freq,
+                                                                metrics_callback=metrics_callback, save_replay_buffer=save_replay_buffer))
+
+    # Train the model with the callbacks, a resumed training continues the timestep count of the checkpoint
+    model.learn(total_timesteps=total_timesteps - model.num_timesteps,
+                callback=CallbackList(training_callbacks + list(callbacks or [])),
+                reset_num_timesteps=resume_from is None)
+    if recordings_dir is not None:
+        env.get_wrapper_attr("flush")()
 
     # Save the model
     model_path = f"{log_dir}/{task}.zip"
@@ -69,6 +127,11 @@ def predict(env, task, total_timesteps=1000, log_dir=None):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate AndroidAgent.")
+    parser.add_argument("--resume", default=None, metavar="CHECKPOINT",
+                        help="Checkpoint directory (logs/<run>/checkpoints/step_<n>) to resume the training from.")
+    args = parser.parse_args()
+
     # Create environment
     env_id = "Android-v0"
     emulator_id = "emulator-5554"  # Default emulator-name
@@ -78,10 +141,24 @@ def main():
     exploration_mode = "guided_restricted"
     episode_timesteps = 100
     total_timesteps = 1000
-    env = gym.make(env_id, emulator_id=emulator_id, task=task, exploration_mode=exploration_mode, episode_timesteps=episode_timesteps)
+    # Store the replay buffer in the checkpoints, required to resume the training with the previous experience
+    save_replay_buffer = True
+    # Persistent UI vocabulary, keeps the IDs in the observations stable across runs and workers
+    vocabulary_path = os.path.join("logs", "ui_vocabulary")
+    # Return the predicted observation of well-known transitions immediately, while the emulator catches up
+    speculation = False
+    # Observation options: "ui_ids", "ui_text" (additionally the encoded texts of the UI options)
+    observation_mode = "ui_ids"
+    # Recorded transitions of previous runs, which prefill the replay buffer. The rewards depend on the exploration
+    # mode and the observations on the episode length and observation mode, so only runs with the same settings
+    # share their recordings
+    recordings_dir = os.path.join("logs", "recordings", f"{task}_{exploration_mode}_{episode_timesteps}_{observation_mode}")
+    env = gym.make(env_id, emulator_id=emulator_id, task=task, exploration_mode=exploration_mode, episode_timesteps=episode_timesteps,
+                   vocabulary_path=vocabulary_path, speculation=speculation, observation_mode=observation_mode)
 
     # Train the model
-    model, train_log_dir = train(env, task, total_timesteps=total_timesteps, episode_timesteps=episode_timesteps)
+    model, train_log_dir = train(env, task, total_timesteps=total_timesteps, episode_timesteps=episode_timesteps,
+                                 recordings_dir=recordings_dir, save_replay_buffer=save_replay_buffer, resume_from=args.resume)
 
     # Continue training and evaluate
     predict(env, task, total_timesteps=total_timesteps, log_dir=train_log_dir)
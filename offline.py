@@ -0,0 +1,71 @@
+from stable_baselines3.common.utils import configure_logger, polyak_update
+from environment.trajectory_recorder import load_trajectories
+
+
+def prefill_replay_buffer(model, directory):
+    """
+    Fill the replay buffer of an off-policy model with the transitions recorded by `TrajectoryRecorder`.
+    Chunks whose observations don't match the replay buffer (e.g. recorded with another observation mode) are skipped.
+
+    Args:
+        model: The DQN model whose replay buffer is filled.
+        directory (str): Directory containing the recorded chunks.
+
+    Returns:
+        transitions (int): The number of transitions added to the replay buffer.
+    """
+    buffer = model.replay_buffer
+    if buffer.n_envs != 1:
+        raise ValueError("Recorded transitions can only be added to a replay buffer of a single environment")
+
+    transitions = 0
+    skipped = 0
+    for chunk in load_trajectories(directory):
+        shapes = ({key: value.shape[1:] for key, value in chunk["obs"].items()} if isinstance(chunk["obs"], dict)
+                  else chunk["obs"].shape[1:])
+        buffer_shapes = dict(buffer.obs_shape) if isinstance(buffer.obs_shape, dict) else buffer.obs_shape
+        if shapes != buffer_shapes:
+            skipped += 1
+            continue
+        dones = chunk["terminated"] | chunk["truncated"]
+        timeouts = chunk["truncated"] & ~chunk["terminated"]
+        for i in range(len(chunk["action"])):
+            if isinstance(chunk["obs"], dict):
+                obs = {key: value[i:i + 1] for key, value in chunk["obs"].items()}
+                next_obs = {key: value[i:i + 1] for key, value in chunk["next_obs"].items()}
+            else:
+                obs, next_obs = chunk["obs"][i:i + 1], chunk["next_obs"][i:i + 1]
+            buffer.add(obs, next_obs, chunk["action"][i:i + 1], chunk["reward"][i:i + 1], dones[i:i + 1],
+                       [{"TimeLimit.truncated": bool(timeouts[i])}])
+            transitions += 1
+
+    if skipped > 0:
+        print(f"Warning: skipped {skipped} recorded chunks whose observations don't match the replay buffer {buffer_shapes}")
+    print(f"Added {transitions} recorded transitions to the replay buffer")
+    return transitions
+
+
+def pretrain_offline(model, gradient_steps, batch_size=None):
+    """
+    Train a DQN model on its replay buffer only, e.g. after `prefill_replay_buffer`, before learning online.
+
+    Args:
+        model: The DQN model to train.
+        gradient_steps (int): The number of gradient steps.
+        batch_size (int): Minibatch size. Defaults to None, which uses the batch size of the model.
+    """
+    batch_size = batch_size or model.batch_size
+    if model.replay_buffer.size() < batch_size:
+        raise ValueError("The replay buffer contains fewer transitions than a single batch")
+
+    # The logger is normally created by `learn`, which replaces this one afterwards
+    if not hasattr(model, "_logger"):
+        model._logger = configure_logger(model.verbose)
+
+    # Update the target network with the same interval (in gradient steps) as during online learning
+    for start in range(0, gradient_steps, model.target_update_interval):
+        model.train(gradient_steps=min(model.target_update_interval, gradient_steps - start), batch_size=batch_size)
+        polyak_update(model.q_net.parameters(), model.q_net_target.parameters(), model.tau)
+        polyak_update(model.batch_norm_stats, model.batch_norm_stats_target, 1.0)
+
+    print(f"Finished offline pretraining - {gradient_steps} gradient steps")
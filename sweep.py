@@ -0,0 +1,307 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+# Parameters of the search space passed to the environment, all others are passed to the DQN
+ENV_PARAMS = ("exploration_mode", "episode_timesteps")
+
+_worker_emulator = None     # Emulator owned by a worker process of the sweep
+
+
+class SuccessRateStopping(BaseCallback):
+    """
+    Callback stopping unpromising trials early, based on the success rate tracked by a `MetricsCallback`.
+    """
+
+    def __init__(self, metrics_callback, min_success_rate, min_timesteps, verbose=1):
+        """
+        Initialize the callback.
+
+        Args:
+            metrics_callback (MetricsCallback): Callback tracking the success rate.
+            min_success_rate (float): Success rate (in percent) the trial must have reached after `min_timesteps`.
+            min_timesteps (int): Timesteps after which the success rate is checked.
+            verbose (int): Verbosity level (0 = silent, 1 = info messages). Defaults to 1.
+        """
+        super(SuccessRateStopping, self).__init__(verbose)
+        self.metrics_callback = metrics_callback
+        self.min_success_rate = min_success_rate
+        self.min_timesteps = min_timesteps
+        self.stopped = False
+
+    def _on_step(self) -> bool:
+        success_rates = self.metrics_callback.metrics['success_rate_percent']
+        if self.num_timesteps >= self.min_timesteps and success_rates and success_rates[-1] < self.min_success_rate:
+            if self.verbose > 0:
+                print(f"Stopping trial at {self.num_timesteps} timesteps - success rate {success_rates[-1]:.1f}%")
+            self.stopped = True
+            return False
+        return True
+
+
+def sample_configs(space, method="grid", n_trials=10, seed=0):
+    """
+    Create the configurations of a search space.
+
+    Args:
+        space (dict): Parameter name -> list of values (grid) or ["uniform"|"loguniform"|"choice", ...] for random
+            sampling, e.g. {"learning_rate": ["loguniform", 1e-4, 1e-2], "gamma": [0.95, 0.99]}.
+        method (str): "grid" for all combinations of the lists or "random" for `n_trials` random samples.
+            Defaults to "grid".
+        n_trials (int): Number of random samples. Defaults to 10.
+        seed (int): Seed of the random sampling. Defaults to 0.
+
+    Returns:
+        configs (list): The configurations as dictionaries.
+    """
+    if method == "grid":
+        names = list(space)
+        return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n_trials):
+        config = {}
+        for name, values in space.items():
+            if values and values[0] == "uniform":
+                config[name] = rng.uniform(values[1], values[2])
+            elif values and values[0] == "loguniform":
+                config[name] = math.exp(rng.uniform(math.log(values[1]), math.log(values[2])))
+            else:
+                config[name] = rng.choice(values[1:] if values and values[0] == "choice" else values)
+        configs.append(config)
+    return configs
+
+
+def _init_worker(emulators):
+    global _worker_emulator
+    _worker_emulator = emulators.get()
+
+
+def run_trial(trial):
+    """
+    Train one configuration on the emulator of the worker process.
+
+    Args:
+        trial (dict): The trial with "id", "config", "budget" (timesteps), "log_dir", "task", "env_id",
+            "resume_from" (budget of the previous rung, whose final checkpoint the trial continues from, or None)
+            and the early stopping settings "min_success_rate" and "min_timesteps".
+
+    Returns:
+        result (dict): The trial with its final metrics.
+    """
+    import gymnasium as gym
+    import environment  # noqa: F401 - registers the environments
+    from checkpoint import list_checkpoints
+    from eval import MetricsCallback
+    from main import train
+
+    config = trial["config"]
+    env_kwargs = {name: config[name] for name in ENV_PARAMS if name in config}
+    dqn_kwargs = {name: value for name, value in config.items() if name not in ENV_PARAMS}
+    episode_timesteps = env_kwargs.get("episode_timesteps", 100)
+
+    # Promoted trials of successive halving continue from the final checkpoint of their previous rung, which can be
+    # a few timesteps beyond its budget (the DQN collects `train_freq` steps at once)
+    resume_from = None
+    if trial["resume_from"] is not None:
+        checkpoints = list_checkpoints(os.path.join(trial["log_dir"], "checkpoints"))
+        if not checkpoints or int(os.path.basename(checkpoints[-1])[len("step_"):]) < trial["resume_from"]:
+            raise FileNotFoundError(f"Trial {trial['id']} can't continue, the checkpoint of its previous rung "
+                                    f"({trial['resume_from']} timesteps) is missing")
+        resume_from = checkpoints[-1]
+
+    env = gym.make(trial["env_id"], emulator_id=_worker_emulator, task=trial["task"], **env_kwargs)
+    metrics_callback = MetricsCallback(log_dir=trial["log_dir"], eval_freq=episode_timesteps, success_threshold=episode_timesteps/2.0)
+    stopping = SuccessRateStopping(metrics_callback, trial["min_success_rate"], trial["min_timesteps"])
+
+    start = time.time()
+    model, _ = train(env, trial["task"], total_timesteps=trial["budget"], episode_timesteps=episode_timesteps,
+                     checkpoint_freq=trial["checkpoint_freq"], resume_from=resume_from,
+                     dqn_kwargs=dqn_kwargs, log_dir=trial["log_dir"], metrics_callback=metrics_callback, callbacks=[stopping])
+    env.close()
+
+    metrics = metrics_callback.metrics
+    return {
+        "trial": trial["id"],
+        "rung": trial["rung"],
+        "emulator": _worker_emulator,
+        **{f"param_{name}": value for name, value in config.items()},
+        "timesteps": model.num_timesteps,
+        "episodes": metrics_callback.total_episodes,
+        "success_rate_percent": metrics['success_rate_percent'][-1] if metrics['success_rate_percent'] else 0.0,
+        "mean_reward": metrics['mean_reward'][-1] if metrics['mean_reward'] else float("nan"),
+        "stopped_early": stopping.stopped,
+        "wall_time_s": time.time() - start,
+        "log_dir": trial["log_dir"],
+    }
+
+
+def run_sweep(space, task="airplane", emulators=("emulator-5554",), env_id="Android-v0", method="grid",
+              n_trials=10, total_timesteps=1000, min_budget=None, eta=3, min_success_rate=0.0, min_timesteps=None,
+              sweep_dir=None, seed=0):
+    """
+    Run a hyperparameter sweep, scheduling the trials on a process pool with one worker per emulator.
+
+    Args:
+        space (dict): The search space, see `sample_configs`.
+        task (str): The task to train. Defaults to "airplane".
+        emulators (tuple): The emulators to use, each worker process owns one of them.
+            Defaults to ("emulator-5554",).
+        env_id (str): The environment, e.g. "Android-v0" or a replay backend. Defaults to "Android-v0".
+        method (str): "grid", "random" or "halving" (successive halving of random samples). Defaults to "grid".
+        n_trials (int): Number of random samples. Defaults to 10.
+        total_timesteps (int): Timesteps of a trial, for successive halving of the last rung. Defaults to 1000.
+        min_budget (int): Timesteps of the first rung of successive halving. Defaults to total_timesteps / eta^2.
+        eta (int): Successive halving keeps the best 1/eta of the trials per rung. Defaults to 3.
+        min_success_rate (float): Trials below this success rate (in percent) after `min_timesteps` are stopped
+            early. Defaults to 0.0, which disables early stopping.
+        min_timesteps (int): Timesteps after which the success rate is checked. Defaults to half the budget.
+        sweep_dir (str): Directory of the sweep. Defaults to a timestamped directory in "logs".
+        seed (int): Seed of the random sampling. Defaults to 0.
+
+    Returns:
+        results (list): The results of all trials, also written to "results.csv" in the sweep directory. Failed trials
+            are recorded with "failed" and their "error" and are not promoted.
+    """
+    sweep_dir = sweep_dir or os.path.join("logs", "sweep_{0}_{1}".format(task, time.strftime("%Y%m%d_%H%M%S")))
+    os.makedirs(sweep_dir, exist_ok=True)
+    configs = sample_configs(space, "grid" if method == "grid" else "random", n_trials=n_trials, seed=seed)
+    with open(os.path.join(sweep_dir, "space.json"), "w") as f:
+        json.dump({"space": space, "method": method, "configs": configs}, f, indent=2)
+
+    if method == "halving":
+        min_budget = min_budget or max(1, total_timesteps // eta ** 2)
+        budgets = []
+        budget = min_budget
+        while budget < total_timesteps:
+            budgets.append(budget)
+            budget *= eta
+        budgets.append(total_timesteps)
+    else:
+        min_budget = total_timesteps
+        budgets = [total_timesteps]
+
+    context = multiprocessing.get_context("spawn")
+    emulator_queue = context.Queue()
+    for emulator_id in emulators:
+        emulator_queue.put(emulator_id)
+
+    results = []
+    trial_ids = list(range(len(configs)))
+    with ProcessPoolExecutor(max_workers=len(emulators), mp_context=context, initializer=_init_worker,
+                             initargs=(emulator_queue,)) as executor:
+        for rung, budget in enumerate(budgets):
+            trials = [{
+                "id": trial_id,
+                "rung": rung,
+                "config": configs[trial_id],
+                "budget": budget,
+                "task": task,
+                "env_id": env_id,
+                "log_dir": os.path.join(sweep_dir, f"trial_{trial_id:03d}"),
+                "resume_from": budgets[rung - 1] if rung > 0 else None,
+                "checkpoint_freq": min_budget,
+                "min_success_rate": min_success_rate,
+                "min_timesteps": min_timesteps or budget // 2,
+            } for trial_id in trial_ids]
+            # A failing trial (e.g. a lost emulator) is recorded as failed, the other trials keep running
+            futures = [executor.submit(run_trial, trial) for trial in trials]
+            rung_results = []
+            for trial, future in zip(trials, futures):
+                try:
+                    result = dict(future.result(), failed=False, error="")
+                except Exception as error:
+                    print(f"Trial {trial['id']} failed in rung {trial['rung']}: {error!r}")
+                    result = _failed_result(trial, error)
+                rung_results.append(result)
+            results.extend(rung_results)
+            _write_results(results, sweep_dir)
+
+            # Promote the best 1/eta of the trials which neither failed nor were stopped early
+            ranked = sorted((result for result in rung_results if not result["failed"] and not result["stopped_early"]),
+                            key=lambda result: (result["success_rate_percent"], result["mean_reward"]), reverse=True)
+            trial_ids = [result["trial"] for result in ranked[:max(1, len(ranked) // eta)]]
+            if not trial_ids:
+                break
+
+    _print_results(results)
+    return results
+
+
+def _failed_result(trial, error):
+    return {
+        "trial": trial["id"],
+        "rung": trial["rung"],
+        "emulator": "",
+        **{f"param_{name}": value for name, value in trial["config"].items()},
+        "timesteps": 0,
+        "episodes": 0,
+        "success_rate_percent": 0.0,
+        "mean_reward": float("nan"),
+        "stopped_early": False,
+        "wall_time_s": float("nan"),
+        "log_dir": trial["log_dir"],
+        "failed": True,
+        "error": repr(error),
+    }
+
+
+def _write_results(results, sweep_dir):
+    columns = list(dict.fromkeys(column for result in results for column in result))
+    with open(os.path.join(sweep_dir, "results.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _print_results(results):
+    columns = [column for column in dict.fromkeys(column for result in results for column in result) if column != "log_dir"]
+    results = sorted(results, key=lambda result: (result["trial"], result["rung"]))
+    rows = [[_format(result.get(column, "")) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def _format(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep of the DQN on Android tasks.")
+    parser.add_argument("--space", required=True, help="JSON file with the search space, see sample_configs.")
+    parser.add_argument("--task", default="airplane")
+    parser.add_argument("--emulator", action="append", dest="emulators",
+                        help="Emulator to use, can be repeated. Defaults to emulator-5554.")
+    parser.add_argument("--env-id", default="Android-v0")
+    parser.add_argument("--method", choices=["grid", "random", "halving"], default="grid")
+    parser.add_argument("--n-trials", type=int, default=10)
+    parser.add_argument("--total-timesteps", type=int, default=1000)
+    parser.add_argument("--min-budget", type=int, default=None)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--min-success-rate", type=float, default=0.0)
+    parser.add_argument("--min-timesteps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.space) as f:
+        space = json.load(f)
+    run_sweep(space, task=args.task, emulators=tuple(args.emulators or ["emulator-5554"]), env_id=args.env_id,
+              method=args.method, n_trials=args.n_trials, total_timesteps=args.total_timesteps,
+              min_budget=args.min_budget, eta=args.eta, min_success_rate=args.min_success_rate,
+              min_timesteps=args.min_timesteps, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
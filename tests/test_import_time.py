@@ -0,0 +1,40 @@
+import os
+import re
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of the environment (in seconds), which every env worker pays on start
+IMPORT_TIME_BUDGET = 1.0
+
+# Modules of the learner and the plotting, which env workers never need
+HEAVY_MODULES = ("matplotlib.pyplot", "pandas", "torch", "stable_baselines3")
+
+
+def _import_times(module):
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        times (dict): Module name -> cumulative import time in seconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {0}".format(module)],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            times[match.group(3)] = int(match.group(1)) / 1e6
+    return times
+
+
+def test_env_import_time_budget():
+    times = _import_times("environment.android_env")
+    assert times["environment.android_env"] < IMPORT_TIME_BUDGET
+
+
+def test_env_import_skips_heavy_modules():
+    times = _import_times("environment.android_env")
+    imported = [module for module in HEAVY_MODULES if module in times]
+    assert not imported, "environment.android_env imports {0}".format(", ".join(imported))